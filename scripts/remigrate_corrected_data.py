@@ -51,7 +51,7 @@ async def clear_and_remigrate():
         
         # 圃場データの確認
         print(f"\n5. 圃場データの確認...")
-        field_collection = await mongo_client.get_collection("圃場データ")
+        field_collection = mongo_client.get_collection("圃場データ")
         sample_field = await field_collection.find_one()
         
         if sample_field:
@@ -56,6 +56,8 @@ def main():
             app,
             host="0.0.0.0",
             port=8000,
+            loop="uvloop",
+            http="httptools",
             log_level="info",
             access_log=True
         )
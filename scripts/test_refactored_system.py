@@ -155,7 +155,7 @@ async def test_message_handler():
         message_handler._initialize_user_session(user_id, "テストユーザー")
         
         # レート制限テスト
-        rate_limit_ok = message_handler._check_rate_limit(user_id)
+        rate_limit_ok = await message_handler._check_rate_limit(user_id)
         print(f"✅ レート制限チェック: {'OK' if rate_limit_ok else 'NG'}")
         
         # メッセージ検証テスト
@@ -165,8 +165,8 @@ async def test_message_handler():
         
         # キャッシュテスト
         test_response = "テストレスポンス"
-        message_handler._cache_response(user_id, "テストメッセージ", test_response)
-        cached_response = message_handler._get_cached_response(user_id, "テストメッセージ")
+        await message_handler._cache_response(user_id, "テストメッセージ", test_response)
+        cached_response = await message_handler._get_cached_response(user_id, "テストメッセージ")
         print(f"✅ キャッシュテスト: {'OK' if cached_response == test_response else 'NG'}")
         
         # 統計情報を取得
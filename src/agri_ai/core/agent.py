@@ -5,6 +5,7 @@ LangChain agent for agricultural AI system.
 import logging
 import time
 import asyncio
+from datetime import datetime
 from typing import Dict, Any, List, Optional, Protocol
 from langchain.agents import AgentType, initialize_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -143,25 +144,26 @@ class AgriAIAgent:
         """Process a user message and return AI response."""
         start_time = time.time()
         self.total_requests += 1
+        now = datetime.now()
         
         try:
             # Add message to conversation history
-            self.context_manager.add_question_to_history(user_id, user_message)
+            self.context_manager.add_question_to_history(user_id, user_message, now=now)
             
             # Resolve ellipsis using context
             resolved_message = self.context_manager.resolve_ellipsis(user_id, user_message)
             
             # Infer context from message
-            inferred_context = self.context_manager.infer_context_from_message(user_id, resolved_message)
+            inferred_context = self.context_manager.infer_context_from_message(user_id, resolved_message, now=now)
             if inferred_context:
-                self.context_manager.update_context(user_id, **inferred_context)
+                self.context_manager.update_context(user_id, now=now, **inferred_context)
             
             # Get relevant context
-            relevant_context = self.context_manager.get_relevant_context(user_id, resolved_message)
+            relevant_context = self.context_manager.get_relevant_context(user_id, resolved_message, now=now)
             
             # Check if message is a work report
             if self._is_work_report(resolved_message):
-                response = await self._process_work_report(resolved_message, user_id)
+                response = await self._process_work_report(resolved_message, user_id, now)
             else:
                 # Prepare contextualized message
                 context_info = ""
@@ -205,22 +207,23 @@ class AgriAIAgent:
         ]
         return any(indicator in message for indicator in report_indicators)
     
-    async def _process_work_report(self, message: str, user_id: str) -> str:
+    async def _process_work_report(self, message: str, user_id: str, now: Optional[datetime] = None) -> str:
         """Process a work report message."""
+        now = now or datetime.now()
         try:
             # Parse the work report
-            parsed_report = self.report_parser.parse_report(message)
+            parsed_report = self.report_parser.parse_report(message, now=now)
             
             # Validate the report
             issues = self.report_parser.validate_report(parsed_report)
             
             # Update context with work information
             if parsed_report.task_name:
-                self.context_manager.update_context(user_id, current_task=parsed_report.task_name)
+                self.context_manager.update_context(user_id, now=now, current_task=parsed_report.task_name)
             if parsed_report.field_name:
-                self.context_manager.update_context(user_id, current_field=parsed_report.field_name)
+                self.context_manager.update_context(user_id, now=now, current_field=parsed_report.field_name)
             if parsed_report.crop_name:
-                self.context_manager.update_context(user_id, current_crop=parsed_report.crop_name)
+                self.context_manager.update_context(user_id, now=now, current_crop=parsed_report.crop_name)
             
             # Add to work history
             work_info = {
@@ -231,7 +234,7 @@ class AgriAIAgent:
                 "materials": parsed_report.materials_used,
                 "confidence": parsed_report.confidence_score
             }
-            self.context_manager.add_work_to_history(user_id, work_info)
+            self.context_manager.add_work_to_history(user_id, work_info, now=now)
             
             # Format response
             response_parts = []
@@ -339,8 +342,8 @@ class OptimizedAgentManager:
     
     def clear_user_memory(self, user_id: str):
         """ユーザーメモリをクリア"""
-        if user_id in self.agent_pool.agents:
-            agent = self.agent_pool.agents[user_id]
+        agent = self.agent_pool.get_existing_agent(user_id)
+        if agent is not None:
             if hasattr(agent, 'clear_memory'):
                 agent.clear_memory()
                 logger.info(f"Cleared memory for user {user_id}")
@@ -389,6 +392,11 @@ class AgentManager:
         """Get list of users with active agents."""
         return list(self.agents.keys())
     
+    @property
+    def total_agents(self) -> int:
+        """Number of active agents (cheap enough for health checks)."""
+        return len(self.agents)
+    
     async def process_user_message(self, user_id: str, message: str) -> str:
         """Process a message for a specific user."""
         agent = self.get_agent(user_id)
@@ -4,7 +4,7 @@
 
 import asyncio
 import logging
-from typing import Dict, Optional, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from weakref import WeakValueDictionary
@@ -18,7 +18,7 @@ from ..utils.config import get_settings
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentStats:
     """エージェント統計情報"""
     created_at: datetime
@@ -38,14 +38,14 @@ class AgentPool:
         self.max_agents = self.settings.max_agents
         self.agent_ttl = timedelta(minutes=self.settings.agent_ttl_minutes)
         
-        # エージェント管理
-        self.agents: Dict[str, 'AgriAIAgent'] = {}
-        self.agent_stats: Dict[str, AgentStats] = {}
+        # エージェント管理（エージェントと統計を1エントリで保持し、ハッシュ探索を1回に抑える）
+        self._entries: Dict[str, Tuple['AgriAIAgent', AgentStats]] = {}
         self.agent_locks: Dict[str, asyncio.Lock] = {}
         
         # バックグラウンドタスク
         self.cleanup_task: Optional[asyncio.Task] = None
         self.cleanup_interval = timedelta(minutes=5)
+        self.cleanup_concurrency = 16
         
         # 統計
         self.total_agents_created = 0
@@ -96,14 +96,15 @@ class AgentPool:
         
         async with self.agent_locks[user_id]:
             # 既存エージェントを確認
-            if user_id in self.agents:
-                agent = self.agents[user_id]
-                stats = self.agent_stats[user_id]
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                agent, stats = entry
                 
                 # TTL チェック
-                if datetime.now() - stats.last_used < self.agent_ttl:
+                now = datetime.now()
+                if now - stats.last_used < self.agent_ttl:
                     # エージェントが有効、統計を更新
-                    stats.last_used = datetime.now()
+                    stats.last_used = now
                     logger.debug(f"Reusing existing agent for user {user_id}")
                     return agent
                 else:
@@ -112,7 +113,7 @@ class AgentPool:
                     await self._remove_agent(user_id)
             
             # プールサイズをチェック
-            if len(self.agents) >= self.max_agents:
+            if len(self._entries) >= self.max_agents:
                 await self._cleanup_oldest_agent()
             
             # 新しいエージェントを作成
@@ -127,22 +128,20 @@ class AgentPool:
             # エージェントを作成
             agent = AgriAIAgent(self.optimized_db)
             
-            # プールに追加
-            self.agents[user_id] = agent
-            
-            # 統計を初期化
+            # 統計を初期化してプールに追加
             now = datetime.now()
-            self.agent_stats[user_id] = AgentStats(
+            stats = AgentStats(
                 created_at=now,
                 last_used=now,
                 message_count=0,
                 total_processing_time=0.0,
                 error_count=0
             )
+            self._entries[user_id] = (agent, stats)
             
             self.total_agents_created += 1
             
-            logger.info(f"Created new agent for user {user_id} (total: {len(self.agents)})")
+            logger.info(f"Created new agent for user {user_id} (total: {len(self._entries)})")
             return agent
             
         except Exception as e:
@@ -154,38 +153,34 @@ class AgentPool:
     
     async def _remove_agent(self, user_id: str):
         """エージェントを削除"""
-        if user_id in self.agents:
-            try:
-                agent = self.agents[user_id]
-                
-                # エージェントのクリーンアップ
-                if hasattr(agent, 'clear_memory'):
-                    agent.clear_memory()
-                
-                # プールから削除
-                del self.agents[user_id]
-                del self.agent_stats[user_id]
-                
-                # ロックも削除
-                if user_id in self.agent_locks:
-                    del self.agent_locks[user_id]
-                
-                self.total_agents_removed += 1
-                
-                logger.debug(f"Removed agent for user {user_id}")
-                
-            except Exception as e:
-                logger.error(f"Error removing agent for user {user_id}: {e}")
+        # pop で取り出すことで、同時に削除が走っても KeyError にならない
+        entry = self._entries.pop(user_id, None)
+        self.agent_locks.pop(user_id, None)
+        if entry is None:
+            return
+        
+        agent, _ = entry
+        self.total_agents_removed += 1
+        
+        try:
+            # エージェントのクリーンアップ
+            if hasattr(agent, 'clear_memory'):
+                agent.clear_memory()
+            
+            logger.debug(f"Removed agent for user {user_id}")
+            
+        except Exception as e:
+            logger.error(f"Error removing agent for user {user_id}: {e}")
     
     async def _cleanup_oldest_agent(self):
         """最も古いエージェントをクリーンアップ"""
-        if not self.agents:
+        if not self._entries:
             return
         
         # 最も古いエージェントを見つける
         oldest_user = min(
-            self.agent_stats.keys(),
-            key=lambda u: self.agent_stats[u].last_used
+            self._entries.keys(),
+            key=lambda u: self._entries[u][1].last_used
         )
         
         logger.info(f"Removing oldest agent for user {oldest_user} to make space")
@@ -196,22 +191,33 @@ class AgentPool:
         now = datetime.now()
         expired_users = []
         
-        for user_id, stats in self.agent_stats.items():
+        for user_id, (_, stats) in self._entries.items():
             if now - stats.last_used > self.agent_ttl:
                 expired_users.append(user_id)
         
         for user_id in expired_users:
             logger.info(f"Cleaning up expired agent for user {user_id}")
-            await self._remove_agent(user_id)
+        await self._remove_agents(expired_users)
         
         if expired_users:
             logger.info(f"Cleaned up {len(expired_users)} expired agents")
     
     async def _cleanup_all_agents(self):
         """全エージェントをクリーンアップ"""
-        user_ids = list(self.agents.keys())
-        for user_id in user_ids:
-            await self._remove_agent(user_id)
+        await self._remove_agents(list(self._entries.keys()))
+    
+    async def _remove_agents(self, user_ids: List[str]):
+        """複数エージェントを並行して削除（同時実行数は cleanup_concurrency まで）"""
+        if not user_ids:
+            return
+        
+        semaphore = asyncio.Semaphore(self.cleanup_concurrency)
+        
+        async def remove(user_id: str):
+            async with semaphore:
+                await self._remove_agent(user_id)
+        
+        await asyncio.gather(*(remove(user_id) for user_id in user_ids))
     
     async def _cleanup_loop(self):
         """バックグラウンドクリーンアップループ"""
@@ -231,8 +237,9 @@ class AgentPool:
         error_occurred: bool = False
     ):
         """エージェント統計を更新"""
-        if user_id in self.agent_stats:
-            stats = self.agent_stats[user_id]
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            stats = entry[1]
             stats.last_used = datetime.now()
             stats.message_count += 1
             stats.total_processing_time += processing_time
@@ -242,10 +249,11 @@ class AgentPool:
     
     def get_agent_info(self, user_id: str) -> Optional[Dict]:
         """エージェント情報を取得"""
-        if user_id not in self.agents:
+        entry = self._entries.get(user_id)
+        if entry is None:
             return None
         
-        stats = self.agent_stats[user_id]
+        stats = entry[1]
         return {
             "user_id": user_id,
             "created_at": stats.created_at.isoformat(),
@@ -266,14 +274,14 @@ class AgentPool:
     def get_pool_stats(self) -> Dict:
         """プール統計を取得"""
         now = datetime.now()
-        active_agents = len(self.agents)
+        active_agents = len(self._entries)
         
         # アクティブエージェントの統計
-        if self.agent_stats:
-            total_messages = sum(stats.message_count for stats in self.agent_stats.values())
-            total_errors = sum(stats.error_count for stats in self.agent_stats.values())
+        if self._entries:
+            total_messages = sum(stats.message_count for _, stats in self._entries.values())
+            total_errors = sum(stats.error_count for _, stats in self._entries.values())
             avg_processing_time = (
-                sum(stats.total_processing_time for stats in self.agent_stats.values()) / 
+                sum(stats.total_processing_time for _, stats in self._entries.values()) / 
                 total_messages if total_messages > 0 else 0
             )
         else:
@@ -296,7 +304,12 @@ class AgentPool:
     
     def get_active_users(self) -> Set[str]:
         """アクティブユーザーIDのセットを取得"""
-        return set(self.agents.keys())
+        return set(self._entries.keys())
+    
+    def get_existing_agent(self, user_id: str) -> Optional['AgriAIAgent']:
+        """プール内の既存エージェントを取得（作成はしない）"""
+        entry = self._entries.get(user_id)
+        return entry[0] if entry is not None else None
 
 
 # グローバルエージェントプールインスタンス
@@ -4,8 +4,11 @@ MongoDB connection and database operations for the Agricultural AI Agent.
 
 import logging
 import os
+import time
+from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pymongo import WriteConcern
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from dotenv import load_dotenv
 
@@ -23,6 +26,10 @@ class MongoDBClient:
         self.mongodb_uri = os.getenv("MONGODB_URI")
         self.database_name = os.getenv("MONGODB_DATABASE", "agri_ai_db")
         
+        # Health check debounce: skip the ping if one succeeded recently
+        self._last_ping_ts = 0.0
+        self._ping_ttl = 5.0
+        
         if not self.mongodb_uri:
             raise ValueError("MONGODB_URI environment variable is required")
     
@@ -46,16 +53,25 @@ class MongoDBClient:
             self.client.close()
             logger.info("Disconnected from MongoDB")
     
-    async def get_collection(self, collection_name: str):
+    def get_collection(self, collection_name: str) -> AsyncIOMotorCollection:
         """Get a collection from the database."""
         if self.database is None:
             raise RuntimeError("Database not connected")
         return self.database[collection_name]
     
     async def health_check(self) -> bool:
-        """Check if the database connection is healthy."""
+        """Check if the database connection is healthy.
+
+        A successful ping is trusted for ``_ping_ttl`` seconds so that
+        frequently polled health endpoints do not hit the server every time.
+        """
+        now = time.monotonic()
+        if now - self._last_ping_ts < self._ping_ttl:
+            return True
+        
         try:
             await self.client.admin.command('ping')
+            self._last_ping_ts = now
             return True
         except Exception as e:
             logger.error(f"Database health check failed: {e}")
@@ -67,10 +83,19 @@ class AgriDatabase:
     
     def __init__(self, mongo_client: MongoDBClient):
         self.mongo_client = mongo_client
+        self._collections: Dict[str, AsyncIOMotorCollection] = {}
+    
+    def _get(self, collection_name: str) -> AsyncIOMotorCollection:
+        """Get a collection handle, caching it for subsequent calls."""
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            collection = self.mongo_client.get_collection(collection_name)
+            self._collections[collection_name] = collection
+        return collection
     
     async def get_today_tasks(self, worker_id: str, date: str) -> List[Dict[str, Any]]:
         """Get today's tasks for a specific worker."""
-        collection = await self.mongo_client.get_collection("作業タスク")
+        collection = self._get("作業タスク")
         
         # Query for tasks on the specified date
         query = {
@@ -87,7 +112,7 @@ class AgriDatabase:
     
     async def complete_task(self, task_id: str, completion_data: Dict[str, Any]) -> bool:
         """Mark a task as completed and log the completion."""
-        collection = await self.mongo_client.get_collection("作業タスク")
+        collection = self._get("作業タスク")
         
         try:
             result = await collection.update_one(
@@ -114,7 +139,7 @@ class AgriDatabase:
     
     async def get_field_status(self, field_name: str) -> Optional[Dict[str, Any]]:
         """Get current status of a specific field."""
-        collection = await self.mongo_client.get_collection("圃場データ")
+        collection = self._get("圃場データ")
         
         query = {"圃場名": field_name}
         field_data = await collection.find_one(query)
@@ -128,7 +153,7 @@ class AgriDatabase:
     
     async def get_pesticide_recommendations(self, field_name: str, crop: str) -> List[Dict[str, Any]]:
         """Get pesticide recommendations for a specific field and crop."""
-        collection = await self.mongo_client.get_collection("field_management")
+        collection = self._get("field_management")
         
         # Get field data
         field_data = await self.get_field_status(field_name)
@@ -136,7 +161,7 @@ class AgriDatabase:
             return []
         
         # Get general material recommendations (filter by material classification)
-        material_collection = await self.mongo_client.get_collection("資材マスター")
+        material_collection = self._get("資材マスター")
         query = {"資材分類": "農薬"}
         cursor = material_collection.find(query)
         recommendations = await cursor.to_list(length=None)
@@ -146,7 +171,7 @@ class AgriDatabase:
     
     async def get_recent_material_usage(self, field_name: str) -> List[Dict[str, Any]]:
         """Get recent material usage for a specific field."""
-        collection = await self.mongo_client.get_collection("資材使用ログ")
+        collection = self._get("資材使用ログ")
         
         query = {"圃場名": field_name}
         cursor = collection.find(query).sort("使用日", -1).limit(10)
@@ -157,9 +182,8 @@ class AgriDatabase:
     
     async def schedule_next_task(self, field_name: str, task_type: str, days_ahead: int = 7) -> bool:
         """Schedule next task automatically."""
-        from datetime import datetime, timedelta
-        
-        collection = await self.mongo_client.get_collection("作業タスク")
+        # 自動生成タスクはサーバーの書き込み確認を待たない（w=0）
+        collection = self._get("作業タスク").with_options(write_concern=WriteConcern(w=0))
         
         next_date = (datetime.now() + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
         
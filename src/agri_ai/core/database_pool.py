@@ -4,13 +4,15 @@
 
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Union
-from datetime import datetime, timedelta
+import pickle
+import time
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple, Union
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pymongo import WriteConcern
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
-from cachetools import TTLCache
-import hashlib
-import json
+from cachetools import LRUCache
+import msgpack
+import xxhash
 
 from ..exceptions import DatabaseConnectionError, DatabaseQueryError
 from ..utils.error_handling import DatabaseErrorHandler
@@ -19,6 +21,146 @@ from ..utils.config import get_settings
 logger = logging.getLogger(__name__)
 
 
+# クエリ演算子として使うとき、要素の順序が意味を持たない演算子
+_SET_OPERATORS = ("$in", "$nin", "$all")
+# 値が集計式になる演算子（式の $in は [値, 配列] で引数の順序に意味がある）
+_EXPRESSION_OPERATORS = ("$expr", "$where", "$function")
+
+
+def _canonicalize(obj: Any, query: bool = False) -> Any:
+    """クエリを正規形に変換する（意味的に同じクエリが同じキャッシュキーになるように）
+
+    辞書のキーを再帰的にソートする。query が True（クエリ条件の中）のときだけ
+    {"$eq": x} を x に、$in などの要素を並べ替える。集計パイプラインでは $match の中だけが
+    クエリ条件で、$expr などの集計式の中は並べ替えない。
+    """
+    if isinstance(obj, dict):
+        if query and len(obj) == 1 and "$eq" in obj and not isinstance(obj["$eq"], (list, tuple)):
+            return _canonicalize(obj["$eq"], query)
+        canonical = {}
+        for key in sorted(obj):
+            if key == "$match":
+                child_query = True
+            elif key in _EXPRESSION_OPERATORS:
+                child_query = False
+            else:
+                child_query = query
+            value = _canonicalize(obj[key], child_query)
+            if query and key in _SET_OPERATORS and isinstance(value, list):
+                value = sorted(value, key=lambda item: msgpack.packb(item, default=str, use_bin_type=True))
+            canonical[key] = value
+        return canonical
+    if isinstance(obj, (list, tuple)):
+        return [_canonicalize(item, query) for item in obj]
+    return obj
+
+
+def _is_operator_expr(value: Any) -> bool:
+    """{"$in": [...]} のような演算子式かどうか"""
+    return isinstance(value, dict) and any(str(k).startswith("$") for k in value)
+
+
+def _is_scalar_key(field: str) -> bool:
+    """配列にならないキー項目（_id・〜ID）かどうか"""
+    return "." not in field and (field == "_id" or field.endswith("ID"))
+
+
+def _equality_fields(filter_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """フィルタのうちキー項目への単純な等価条件だけを取り出す
+
+    {"f": v} は配列フィールド f が v を含む場合にも一致するため、
+    配列になり得るフィールドではフィルタの値をドキュメントの値とみなせない。
+    """
+    return {
+        field: value
+        for field, value in filter_dict.items()
+        if _is_scalar_key(field) and not _is_operator_expr(value)
+    }
+
+
+def _could_match(predicate: Optional[Dict[str, Any]], known: Dict[str, Any], complete: bool) -> bool:
+    """書き込まれたドキュメントがキャッシュ済みクエリの条件に一致し得るか（判定できなければ True）
+
+    known は書き込み対象ドキュメントの既知フィールド、complete は known がドキュメント全体かどうか。
+    """
+    if predicate is None:
+        return True
+    for field, cond in predicate.items():
+        if field.startswith("$"):
+            # $or / $expr などは評価しない
+            return True
+        if "." in field or _is_operator_expr(cond):
+            continue
+        if field in known:
+            value = known[field]
+            if value != cond and not (isinstance(value, list) and cond in value):
+                return False
+        elif complete and cond is not None:
+            # 挿入ドキュメントに存在しないフィールドへの等価条件は一致しない
+            return False
+    return True
+
+
+def _update_images(
+    filter_dict: Dict[str, Any], update_dict: Dict[str, Any]
+) -> Optional[List[Tuple[Dict[str, Any], bool]]]:
+    """update の更新前・更新後ドキュメントについて分かっているフィールドを返す（置換更新なら None）"""
+    if not update_dict or not all(op.startswith("$") for op in update_dict):
+        return None
+    before = _equality_fields(filter_dict)
+    after = dict(before)
+    for op, fields in update_dict.items():
+        changed = list(fields) + (list(fields.values()) if op == "$rename" else [])
+        for field in changed:
+            # 変更されるフィールド（親子パスを含む）は更新後の値が分からない
+            for name in [n for n in after if n == field or n.startswith(field + ".") or field.startswith(n + ".")]:
+                del after[name]
+        if op in ("$set", "$setOnInsert"):
+            after.update({field: value for field, value in fields.items() if "." not in field})
+    return [(before, False), (after, False)]
+
+
+def _lookup_collections(pipeline: List[Dict[str, Any]]) -> Set[str]:
+    """パイプラインが $lookup などで参照する他コレクション名（ネストしたパイプラインを含む）"""
+    names: Set[str] = set()
+    for stage in pipeline:
+        for op, spec in stage.items():
+            if op in ("$lookup", "$graphLookup"):
+                names.add(spec["from"])
+                names.update(_lookup_collections(spec.get("pipeline", [])))
+            elif op == "$unionWith":
+                if isinstance(spec, str):
+                    names.add(spec)
+                else:
+                    names.add(spec["coll"])
+                    names.update(_lookup_collections(spec.get("pipeline", [])))
+            elif op == "$facet":
+                for sub_pipeline in spec.values():
+                    names.update(_lookup_collections(sub_pipeline))
+    return names
+
+
+def _entry_size(entry: Tuple[Any, float]) -> int:
+    """キャッシュエントリのおおよそのバイト数（結果を pickle したサイズ）"""
+    return len(pickle.dumps(entry[0], pickle.HIGHEST_PROTOCOL))
+
+
+class _IndexedLRUCache(LRUCache):
+    """エントリ削除時（容量超過による追い出しを含む）にコールバックを呼ぶ LRUCache"""
+    
+    def __init__(self, maxsize, on_remove: Callable[[Any], None], getsizeof=None):
+        super().__init__(maxsize=maxsize, getsizeof=getsizeof)
+        self._on_remove = on_remove
+    
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._on_remove(key)
+
+
+# キャッシュミスを表す番兵（None や空リストも正当な結果のため）
+_MISS = object()
+
+
 class DatabasePool:
     """データベースコネクションプール"""
     
@@ -27,18 +169,34 @@ class DatabasePool:
         self.client: Optional[AsyncIOMotorClient] = None
         self.database: Optional[AsyncIOMotorDatabase] = None
         self.collections: Dict[str, AsyncIOMotorCollection] = {}
+        # 接続時にハンドルを事前生成するコレクション名
+        self._prewarm_names: Set[str] = set()
         
-        # クエリキャッシュ（TTL: 5分）
-        self.query_cache = TTLCache(maxsize=1000, ttl=300)
+        # クエリキャッシュ（結果のバイト数で上限を設けた LRU。値は (結果, 有効期限) で TTL: 5分）
+        self.cache_ttl = 300.0
+        self.query_cache = _IndexedLRUCache(
+            maxsize=self.settings.query_cache_max_bytes,
+            on_remove=self._forget_cache_key,
+            getsizeof=_entry_size
+        )
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # コレクション名 → {キャッシュキー: クエリ条件} の索引（書き込み時の無効化用）
+        self._keys_by_collection: Dict[str, Dict[int, Optional[Dict[str, Any]]]] = {}
+        # キャッシュキー → 登録先のコレクション名（$lookup 先を含む）
+        self._collection_by_key: Dict[int, Tuple[str, ...]] = {}
         
         # 接続状態管理
         self.is_connected = False
+        # connect/disconnect の直列化専用（クエリ経路は is_connected を見るだけでロックを取らない）
         self.connection_lock = asyncio.Lock()
-        self.last_health_check = None
-        self.health_check_interval = timedelta(minutes=5)
     
     async def connect(self) -> None:
         """データベースに接続"""
+        # 接続済みならロックを取らずに返す（ダブルチェックロッキング）
+        if self.is_connected:
+            return
+        
         async with self.connection_lock:
             if self.is_connected:
                 return
@@ -46,15 +204,19 @@ class DatabasePool:
             try:
                 logger.info("Connecting to MongoDB...")
                 
+                settings = self.settings
                 self.client = AsyncIOMotorClient(
-                    self.settings.mongodb_uri,
-                    serverSelectionTimeoutMS=30000,
-                    connectTimeoutMS=30000,
+                    settings.mongodb_uri,
+                    serverSelectionTimeoutMS=settings.mongodb_server_selection_timeout_ms,
+                    connectTimeoutMS=settings.mongodb_connect_timeout_ms,
                     socketTimeoutMS=30000,
-                    maxPoolSize=100,
-                    minPoolSize=10,
-                    maxIdleTimeMS=30000,
-                    waitQueueMultiple=10,
+                    maxPoolSize=settings.mongodb_max_pool_size,
+                    minPoolSize=settings.mongodb_min_pool_size,
+                    maxIdleTimeMS=settings.mongodb_max_idle_time_ms,
+                    maxConnecting=settings.mongodb_max_connecting,
+                    # サーバー監視はドライバーの監視スレッドに任せる
+                    heartbeatFrequencyMS=10000,
+                    retryReads=True,
                     retryWrites=True
                 )
                 
@@ -63,7 +225,7 @@ class DatabasePool:
                 
                 self.database = self.client[self.settings.mongodb_database]
                 self.is_connected = True
-                self.last_health_check = datetime.now()
+                self._prewarm_collections(self._prewarm_names)
                 
                 logger.info(f"Successfully connected to MongoDB database: {self.settings.mongodb_database}")
                 
@@ -81,6 +243,10 @@ class DatabasePool:
     
     async def disconnect(self) -> None:
         """データベースから切断"""
+        # 切断済みならロックを取らずに返す（ダブルチェックロッキング）
+        if self.client is None:
+            return
+        
         async with self.connection_lock:
             if self.client:
                 logger.info("Disconnecting from MongoDB...")
@@ -88,46 +254,44 @@ class DatabasePool:
                 self.client = None
                 self.database = None
                 self.collections.clear()
-                self.query_cache.clear()
+                self.clear_cache()
                 self.is_connected = False
                 logger.info("Disconnected from MongoDB")
     
     async def ensure_connection(self) -> None:
         """接続を確保（必要に応じて再接続）"""
-        if not self.is_connected:
-            await self.connect()
+        if self.is_connected:
             return
-        
-        # ヘルスチェック
-        now = datetime.now()
-        if (self.last_health_check is None or 
-            now - self.last_health_check > self.health_check_interval):
-            try:
-                await self.client.admin.command('ping')
-                self.last_health_check = now
-            except Exception as e:
-                logger.warning(f"Health check failed, reconnecting: {e}")
-                await self.disconnect()
-                await self.connect()
+        await self.connect()
     
-    async def get_collection(self, collection_name: str) -> AsyncIOMotorCollection:
-        """コレクションを取得（キャッシュ付き）"""
-        await self.ensure_connection()
-        
-        if collection_name not in self.collections:
-            self.collections[collection_name] = self.database[collection_name]
-        
-        return self.collections[collection_name]
+    def _prewarm_collections(self, names: Iterable[str]) -> None:
+        """コレクションハンドルを事前生成（未接続の場合は次回の connect 時に生成）"""
+        names = tuple(names)
+        self._prewarm_names.update(names)
+        if self.database is None:
+            return
+        for name in names:
+            self.collections[name] = self.database[name]
+    
+    def get_collection(self, collection_name: str) -> AsyncIOMotorCollection:
+        """コレクションを取得（キャッシュ付き・接続確認は呼び出し側で行う）"""
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            if self.database is None:
+                raise DatabaseConnectionError("データベースに接続されていません")
+            collection = self.collections[collection_name] = self.database[collection_name]
+        return collection
     
-    def _get_cache_key(self, operation: str, collection: str, query: Dict[str, Any]) -> str:
-        """キャッシュキーを生成"""
+    def _get_cache_key(self, operation: str, collection: str, query: Dict[str, Any]) -> int:
+        """キャッシュキーを生成（msgpack でシリアライズして xxh3 の64bit整数ハッシュを返す）"""
         key_data = {
             "operation": operation,
             "collection": collection,
-            "query": query
+            # find 系の条件はクエリ、aggregate はパイプライン（$match の中だけがクエリ）
+            "query": _canonicalize(query, query=operation != "aggregate")
         }
-        key_str = json.dumps(key_data, sort_keys=True, default=str)
-        return hashlib.md5(key_str.encode()).hexdigest()
+        buf = msgpack.packb(key_data, default=str, use_bin_type=True)
+        return xxhash.xxh3_64_intdigest(buf)
     
     @DatabaseErrorHandler.handle_query_error(logger)
     async def find_one_cached(
@@ -138,20 +302,24 @@ class DatabasePool:
         use_cache: bool = True
     ) -> Optional[Dict[str, Any]]:
         """キャッシュ付きfind_one"""
-        cache_key = self._get_cache_key("find_one", collection_name, filter_dict)
-        
-        # キャッシュから検索
-        if use_cache and cache_key in self.query_cache:
-            logger.debug(f"Cache hit for find_one: {collection_name}")
-            return self.query_cache[cache_key]
+        # キャッシュから検索（use_cache=False のときはキー生成も省略）
+        cache_key = None
+        if use_cache:
+            cache_key = self._get_cache_key("find_one", collection_name, filter_dict)
+            cached = self._cache_get(cache_key)
+            if cached is not _MISS:
+                logger.debug(f"Cache hit for find_one: {collection_name}")
+                return cached
         
         # データベースから取得
-        collection = await self.get_collection(collection_name)
+        if not self.is_connected:
+            await self.connect()
+        collection = self.get_collection(collection_name)
         result = await collection.find_one(filter_dict, projection)
         
         # キャッシュに保存
-        if use_cache and result:
-            self.query_cache[cache_key] = result
+        if cache_key is not None and result:
+            self._cache_store(collection_name, cache_key, result, filter_dict)
         
         return result
     
@@ -163,35 +331,44 @@ class DatabasePool:
         projection: Optional[Dict[str, int]] = None,
         sort: Optional[List[tuple]] = None,
         limit: Optional[int] = None,
-        use_cache: bool = True
+        use_cache: bool = True,
+        max_results: int = 10_000,
+        batch_size: int = 1000
     ) -> List[Dict[str, Any]]:
-        """キャッシュ付きfind"""
-        cache_key = self._get_cache_key("find_many", collection_name, {
-            "filter": filter_dict,
-            "projection": projection,
-            "sort": sort,
-            "limit": limit
-        })
-        
-        # キャッシュから検索
-        if use_cache and cache_key in self.query_cache:
-            logger.debug(f"Cache hit for find_many: {collection_name}")
-            return self.query_cache[cache_key]
+        """キャッシュ付きfind（limit 未指定時も max_results 件で打ち切る）"""
+        # キャッシュから検索（use_cache=False のときはキー生成も省略）
+        cache_key = None
+        if use_cache:
+            cache_key = self._get_cache_key("find_many", collection_name, {
+                "filter": filter_dict,
+                "projection": projection,
+                "sort": sort,
+                "limit": limit,
+                "max_results": max_results
+            })
+            cached = self._cache_get(cache_key)
+            if cached is not _MISS:
+                logger.debug(f"Cache hit for find_many: {collection_name}")
+                return cached
         
         # データベースから取得
-        collection = await self.get_collection(collection_name)
-        cursor = collection.find(filter_dict, projection)
+        if not self.is_connected:
+            await self.connect()
+        collection = self.get_collection(collection_name)
+        cursor = collection.find(filter_dict, projection).batch_size(batch_size)
         
         if sort:
             cursor = cursor.sort(sort)
-        if limit:
-            cursor = cursor.limit(limit)
+        length = limit or max_results
+        cursor = cursor.limit(length)
         
-        result = await cursor.to_list(length=limit)
+        result = await cursor.to_list(length=length)
+        if not limit and len(result) >= max_results:
+            logger.warning(f"find_many truncated at {max_results} results: {collection_name}")
         
         # キャッシュに保存
-        if use_cache:
-            self.query_cache[cache_key] = result
+        if cache_key is not None:
+            self._cache_store(collection_name, cache_key, result, filter_dict)
         
         return result
     
@@ -200,24 +377,43 @@ class DatabasePool:
         self,
         collection_name: str,
         pipeline: List[Dict[str, Any]],
-        use_cache: bool = True
+        use_cache: bool = True,
+        max_results: int = 10_000,
+        batch_size: int = 1000
     ) -> List[Dict[str, Any]]:
-        """キャッシュ付きaggregate"""
-        cache_key = self._get_cache_key("aggregate", collection_name, {"pipeline": pipeline})
-        
-        # キャッシュから検索
-        if use_cache and cache_key in self.query_cache:
-            logger.debug(f"Cache hit for aggregate: {collection_name}")
-            return self.query_cache[cache_key]
+        """キャッシュ付きaggregate（結果は max_results 件で打ち切る）"""
+        # キャッシュから検索（use_cache=False のときはキー生成も省略）
+        cache_key = None
+        if use_cache:
+            cache_key = self._get_cache_key("aggregate", collection_name, {
+                "pipeline": pipeline,
+                "max_results": max_results
+            })
+            cached = self._cache_get(cache_key)
+            if cached is not _MISS:
+                logger.debug(f"Cache hit for aggregate: {collection_name}")
+                return cached
         
         # データベースから取得
-        collection = await self.get_collection(collection_name)
-        cursor = collection.aggregate(pipeline)
-        result = await cursor.to_list(length=None)
+        if not self.is_connected:
+            await self.connect()
+        collection = self.get_collection(collection_name)
+        cursor = collection.aggregate(pipeline, batchSize=batch_size)
+        result = await cursor.to_list(length=max_results)
+        if len(result) >= max_results:
+            # 残りの結果はサーバー側のカーソルごと破棄する
+            await cursor.close()
+            logger.warning(f"aggregate truncated at {max_results} results: {collection_name}")
         
         # キャッシュに保存
-        if use_cache:
-            self.query_cache[cache_key] = result
+        if cache_key is not None:
+            # 先頭の $match だけを無効化判定に使う（それ以外は書き込みのたびに無効化）
+            # $lookup 先のコレクションへの書き込みでも無効化する
+            first_stage = pipeline[0] if pipeline else {}
+            self._cache_store(
+                collection_name, cache_key, result, first_stage.get("$match"),
+                related=_lookup_collections(pipeline)
+            )
         
         return result
     
@@ -225,14 +421,19 @@ class DatabasePool:
     async def insert_one(
         self,
         collection_name: str,
-        document: Dict[str, Any]
+        document: Dict[str, Any],
+        write_concern: Optional[WriteConcern] = None
     ) -> str:
-        """ドキュメントを挿入"""
-        collection = await self.get_collection(collection_name)
+        """ドキュメントを挿入（write_concern 指定時はその書き込み確認レベルを使用）"""
+        if not self.is_connected:
+            await self.connect()
+        collection = self.get_collection(collection_name)
+        if write_concern is not None:
+            collection = collection.with_options(write_concern=write_concern)
         result = await collection.insert_one(document)
         
-        # キャッシュを無効化
-        self._invalidate_cache(collection_name)
+        # 挿入ドキュメントに一致し得るキャッシュだけを無効化
+        self._invalidate_cache(collection_name, [(document, True)])
         
         return str(result.inserted_id)
     
@@ -245,11 +446,13 @@ class DatabasePool:
         upsert: bool = False
     ) -> bool:
         """ドキュメントを更新"""
-        collection = await self.get_collection(collection_name)
+        if not self.is_connected:
+            await self.connect()
+        collection = self.get_collection(collection_name)
         result = await collection.update_one(filter_dict, update_dict, upsert=upsert)
         
-        # キャッシュを無効化
-        self._invalidate_cache(collection_name)
+        # 更新前後のドキュメントに一致し得るキャッシュだけを無効化
+        self._invalidate_cache(collection_name, _update_images(filter_dict, update_dict))
         
         return result.modified_count > 0 or (upsert and result.upserted_id is not None)
     
@@ -260,41 +463,101 @@ class DatabasePool:
         filter_dict: Dict[str, Any]
     ) -> bool:
         """ドキュメントを削除"""
-        collection = await self.get_collection(collection_name)
+        if not self.is_connected:
+            await self.connect()
+        collection = self.get_collection(collection_name)
         result = await collection.delete_one(filter_dict)
         
-        # キャッシュを無効化
-        self._invalidate_cache(collection_name)
+        # 削除ドキュメントに一致し得るキャッシュだけを無効化
+        self._invalidate_cache(collection_name, [(_equality_fields(filter_dict), False)])
         
         return result.deleted_count > 0
     
-    def _invalidate_cache(self, collection_name: str):
-        """特定のコレクションのキャッシュを無効化"""
-        keys_to_remove = []
-        for key in self.query_cache.keys():
-            try:
-                # キーからコレクション名を抽出して判定
-                # 実際の実装では、より効率的な方法を使用することを推奨
-                if collection_name in str(key):
-                    keys_to_remove.append(key)
-            except:
-                continue
-        
-        for key in keys_to_remove:
+    def _cache_get(self, cache_key: int) -> Any:
+        """有効期限内のキャッシュ結果を取得（なければ _MISS）"""
+        entry = self.query_cache.get(cache_key)
+        if entry is not None and entry[1] > time.monotonic():
+            self.cache_hits += 1
+            return entry[0]
+        self.cache_misses += 1
+        return _MISS
+    
+    def _cache_store(
+        self,
+        collection_name: str,
+        cache_key: int,
+        result: Any,
+        predicate: Optional[Dict[str, Any]],
+        related: Iterable[str] = ()
+    ) -> None:
+        """結果をキャッシュに保存し、クエリ条件とともにコレクション索引に登録
+
+        related の各コレクション（$lookup 先など）には条件なしで登録し、書き込みのたびに無効化する。
+        """
+        try:
+            self.query_cache[cache_key] = (result, time.monotonic() + self.cache_ttl)
+        except ValueError:
+            # 単体でキャッシュ容量を超える結果はキャッシュしない
+            logger.debug(f"Result too large to cache for collection: {collection_name}")
+            return
+        related = set(related)
+        if collection_name in related:
+            # 自己結合は条件に一致しないドキュメントの書き込みでも結果が変わる
+            predicate = None
+            related.discard(collection_name)
+        self._keys_by_collection.setdefault(collection_name, {})[cache_key] = predicate
+        for name in related:
+            self._keys_by_collection.setdefault(name, {})[cache_key] = None
+        self._collection_by_key[cache_key] = (collection_name, *related)
+    
+    def _forget_cache_key(self, cache_key: int) -> None:
+        """キャッシュから消えたキーを索引から外す"""
+        for collection_name in self._collection_by_key.pop(cache_key, ()):
+            keys = self._keys_by_collection.get(collection_name)
+            if keys is not None:
+                keys.pop(cache_key, None)
+                if not keys:
+                    del self._keys_by_collection[collection_name]
+    
+    def _invalidate_cache(
+        self,
+        collection_name: str,
+        written: Optional[List[Tuple[Dict[str, Any], bool]]] = None
+    ):
+        """特定のコレクションのキャッシュを無効化
+
+        written は書き込まれたドキュメントの (既知フィールド, 全体が既知か) のリスト。
+        いずれかに一致し得るクエリのキャッシュだけを削除する（None なら全件削除）。
+        """
+        entries = self._keys_by_collection.get(collection_name)
+        if not entries:
+            return
+        if written is None:
+            stale = list(entries)
+        else:
+            stale = [
+                key for key, predicate in entries.items()
+                if any(_could_match(predicate, known, complete) for known, complete in written)
+            ]
+        for key in stale:
+            self._forget_cache_key(key)
             self.query_cache.pop(key, None)
     
     def clear_cache(self):
         """全キャッシュをクリア"""
         self.query_cache.clear()
+        self._keys_by_collection.clear()
+        self._collection_by_key.clear()
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """キャッシュ統計を取得"""
         return {
             "cache_size": len(self.query_cache),
-            "max_size": self.query_cache.maxsize,
-            "ttl": self.query_cache.ttl,
-            "hits": getattr(self.query_cache, 'hits', 0),
-            "misses": getattr(self.query_cache, 'misses', 0)
+            "cache_bytes": self.query_cache.currsize,
+            "max_bytes": self.query_cache.maxsize,
+            "ttl": self.cache_ttl,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses
         }
 
 
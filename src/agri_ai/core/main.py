@@ -4,9 +4,11 @@ Main entry point for the Agricultural AI Agent.
 
 import asyncio
 import logging
-from typing import Optional
+import time
+from typing import Optional, Tuple
 
 from .database import MongoDBClient, AgriDatabase
+from .optimized_database import ensure_indexes
 from .agent import AgentManager
 from ..utils.config import get_settings
 
@@ -27,12 +29,17 @@ class AgriAISystem:
         self.agri_db: Optional[AgriDatabase] = None
         self.agent_manager: Optional[AgentManager] = None
         
+        # Health check results are reused for this many seconds
+        self.health_check_interval = 5.0
+        self._last_health: Optional[Tuple[float, dict]] = None
+        
     async def initialize(self):
         """Initialize the system components."""
         try:
             # Initialize database
             self.mongo_client = MongoDBClient()
             await self.mongo_client.connect()
+            await ensure_indexes(self.mongo_client.database)
             
             self.agri_db = AgriDatabase(self.mongo_client)
             
@@ -60,7 +67,11 @@ class AgriAISystem:
         return await self.agent_manager.process_user_message(user_id, message)
     
     async def health_check(self) -> dict:
-        """Perform system health check."""
+        """Perform system health check (cached for ``health_check_interval`` seconds)."""
+        now = time.monotonic()
+        if self._last_health and now - self._last_health[0] < self.health_check_interval:
+            return dict(self._last_health[1])
+        
         health_status = {
             "status": "healthy",
             "database": False,
@@ -73,14 +84,14 @@ class AgriAISystem:
         
         # Check agent manager
         if self.agent_manager:
-            stats = self.agent_manager.get_agent_stats()
-            health_status["agents"] = stats["total_agents"]
+            health_status["agents"] = self.agent_manager.total_agents
         
         # Overall status
         if not health_status["database"]:
             health_status["status"] = "unhealthy"
         
-        return health_status
+        self._last_health = (now, health_status)
+        return dict(health_status)
 
 
 # Global system instance
@@ -2,9 +2,13 @@
 最適化されたAgriDatabaseクラス
 """
 
+import asyncio
 import logging
 from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from cachetools import TTLCache
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel, WriteConcern
 
 from .database_pool import DatabasePool
 from .database import AgriDatabase, MongoDBClient
@@ -13,6 +17,38 @@ from ..utils.error_handling import DatabaseErrorHandler
 
 logger = logging.getLogger(__name__)
 
+# 集約パイプラインの $match / $lookup / $sort で使用するインデックス
+INDEXES: Dict[str, List[IndexModel]] = {
+    "作業計画": [
+        IndexModel([("担当者", ASCENDING), ("予定日", ASCENDING), ("ステータス", ASCENDING)]),
+        IndexModel([("作業計画ID", ASCENDING)]),
+    ],
+    "圃場データ": [
+        IndexModel([("圃場名", ASCENDING)]),
+        IndexModel([("圃場ID", ASCENDING)]),
+    ],
+    "作付計画": [IndexModel([("作付計画ID", ASCENDING)])],
+    "資材データ": [IndexModel([("資材名", ASCENDING)])],
+    "資材使用記録": [
+        IndexModel([("圃場", ASCENDING), ("使用日", DESCENDING)]),
+        IndexModel([("資材名", ASCENDING), ("使用日", DESCENDING)]),
+    ],
+}
+
+
+async def ensure_indexes(database: AsyncIOMotorDatabase) -> None:
+    """必要なインデックスを作成（既存のものはそのまま。失敗しても起動は継続）"""
+    names = list(INDEXES)
+    results = await asyncio.gather(
+        *(database[name].create_indexes(INDEXES[name]) for name in names),
+        return_exceptions=True,
+    )
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Failed to create indexes for {name}: {result}")
+        else:
+            logger.info(f"Ensured indexes for {name}: {result}")
+
 
 class OptimizedAgriDatabase(AgriDatabase):
     """最適化されたAgriDatabaseクラス
@@ -23,6 +59,73 @@ class OptimizedAgriDatabase(AgriDatabase):
     ここでは継承だけ行い、AgriDatabase のメソッドは必要に応じてオーバーライドする。
     """
 
+    # 集約パイプラインの固定部分（呼び出しごとに再構築しない）
+    _TODAY_TASKS_TAIL = (
+        {
+            # 作付計画と圃場データを1つの $lookup 内で結合する
+            "$lookup": {
+                "from": "作付計画",
+                "localField": "関連する作付計画",
+                "foreignField": "作付計画ID",
+                "pipeline": [
+                    {
+                        "$lookup": {
+                            "from": "圃場データ",
+                            "localField": "圃場",
+                            "foreignField": "圃場ID",
+                            "as": "field",
+                        }
+                    },
+                    {"$project": {"作物": 1, "field": {"$arrayElemAt": ["$field", 0]}}},
+                ],
+                "as": "planting_info",
+            }
+        },
+        {
+            "$addFields": {
+                "圃場名 (from 圃場データ) (from 関連する作付計画)": {
+                    "$arrayElemAt": ["$planting_info.field.圃場名", 0]
+                },
+                "作物名": {"$arrayElemAt": ["$planting_info.作物", 0]},
+            }
+        },
+        {"$sort": {"予定日": 1, "作業計画ID": 1}},
+    )
+    _PLANTING_PLANS_LOOKUP = {
+        "$lookup": {
+            "from": "作付計画",
+            "localField": "圃場ID",
+            "foreignField": "圃場",
+            "as": "planting_plans",
+        }
+    }
+    _PESTICIDE_TAIL = (
+        {
+            "$addFields": {
+                "recent_usage_count": {"$size": "$usage_history"},
+                "last_used": {"$max": "$usage_history.使用日"},
+            }
+        },
+        {"$sort": {"recent_usage_count": -1, "資材名": 1}},
+        {"$limit": 10},
+    )
+    _MATERIAL_INFO_STAGES = (
+        {
+            "$lookup": {
+                "from": "資材データ",
+                "localField": "資材名",
+                "foreignField": "資材名",
+                "as": "material_info",
+            }
+        },
+        {"$addFields": {"資材分類": {"$arrayElemAt": ["$material_info.資材分類", 0]}}},
+    )
+    _MATERIAL_USAGE_TAIL = (
+        {"$unwind": "$usage"},
+        {"$replaceRoot": {"newRoot": "$usage"}},
+        {"$sort": {"使用日": -1}},
+    )
+
     def __init__(self, db_pool: DatabasePool):
         # AgriDatabase の __init__ は mongo_client を必須とするため、
         # ダミーの MongoDBClient を生成して親クラスを初期化する。
@@ -43,43 +146,30 @@ class OptimizedAgriDatabase(AgriDatabase):
             "crops": "作物データ",
             "work_records": "作業記録",
         }
+        # 接続済みなら即座に、未接続なら connect 時にハンドルを生成する
+        self.db_pool._prewarm_collections(self.COLLECTIONS.values())
+
+        # 頻出メソッドの結果キャッシュ（パイプライン構築・キー計算も省略する）
+        self._today_tasks_cache = TTLCache(maxsize=512, ttl=30)
+        self._field_status_cache = TTLCache(maxsize=256, ttl=30)
 
     @DatabaseErrorHandler.handle_query_error(logger)
     async def get_today_tasks(self, worker_id: str, date: str) -> List[Dict[str, Any]]:
         """今日のタスクを取得（最適化版）"""
+        cached = self._today_tasks_cache.get((worker_id, date))
+        if cached is not None:
+            return cached
+
         try:
             # 集約パイプラインでJOIN操作を一度に実行
             pipeline = [
                 {"$match": {"担当者": worker_id, "予定日": date, "ステータス": {"$ne": "✅ 完了"}}},
-                {
-                    "$lookup": {
-                        "from": "作付計画",
-                        "localField": "関連する作付計画",
-                        "foreignField": "作付計画ID",
-                        "as": "planting_info",
-                    }
-                },
-                {
-                    "$lookup": {
-                        "from": "圃場データ",
-                        "localField": "planting_info.圃場",
-                        "foreignField": "圃場ID",
-                        "as": "field_info",
-                    }
-                },
-                {
-                    "$addFields": {
-                        "圃場名 (from 圃場データ) (from 関連する作付計画)": {
-                            "$arrayElemAt": ["$field_info.圃場名", 0]
-                        },
-                        "作物名": {"$arrayElemAt": ["$planting_info.作物", 0]},
-                    }
-                },
-                {"$sort": {"予定日": 1, "作業計画ID": 1}},
+                *self._TODAY_TASKS_TAIL,
             ]
 
             tasks = await self.db_pool.aggregate_cached(self.COLLECTIONS["tasks"], pipeline, use_cache=True)
 
+            self._today_tasks_cache[(worker_id, date)] = tasks
             logger.info(f"Retrieved {len(tasks)} tasks for worker {worker_id} on {date}")
             return tasks
 
@@ -93,18 +183,17 @@ class OptimizedAgriDatabase(AgriDatabase):
     @DatabaseErrorHandler.handle_query_error(logger)
     async def get_field_status(self, field_name: str) -> Optional[Dict[str, Any]]:
         """圃場ステータスを取得（最適化版）"""
+        cached = self._field_status_cache.get(field_name)
+        if cached is not None:
+            return cached
+
         try:
+            since = (date.today() - timedelta(days=30)).isoformat()
+
             # 圃場データと関連する作付計画を一度に取得
             pipeline = [
                 {"$match": {"圃場名": field_name}},
-                {
-                    "$lookup": {
-                        "from": "作付計画",
-                        "localField": "圃場ID",
-                        "foreignField": "圃場",
-                        "as": "planting_plans",
-                    }
-                },
+                self._PLANTING_PLANS_LOOKUP,
                 {
                     "$lookup": {
                         "from": "資材使用記録",
@@ -114,7 +203,7 @@ class OptimizedAgriDatabase(AgriDatabase):
                                 "$match": {
                                     "$expr": {"$eq": ["$圃場", "$$field_id"]},
                                     "使用日": {
-                                        "$gte": (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+                                        "$gte": since
                                     },
                                 }
                             },
@@ -135,6 +224,7 @@ class OptimizedAgriDatabase(AgriDatabase):
                 return None
 
             field_data = results[0]
+            self._field_status_cache[field_name] = field_data
             logger.info(f"Retrieved field status for: {field_name}")
             return field_data
 
@@ -148,6 +238,8 @@ class OptimizedAgriDatabase(AgriDatabase):
     async def get_pesticide_recommendations(self, field_name: str, crop: str) -> List[Dict[str, Any]]:
         """農薬推奨を取得（最適化版）"""
         try:
+            since = (date.today() - timedelta(days=90)).isoformat()
+
             # 作物と圃場に基づいて資材を検索
             pipeline = [
                 {
@@ -167,7 +259,7 @@ class OptimizedAgriDatabase(AgriDatabase):
                                 "$match": {
                                     "$expr": {"$eq": ["$資材名", "$$material_name"]},
                                     "使用日": {
-                                        "$gte": (datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d")
+                                        "$gte": since
                                     },
                                 }
                             }
@@ -175,14 +267,7 @@ class OptimizedAgriDatabase(AgriDatabase):
                         "as": "usage_history",
                     }
                 },
-                {
-                    "$addFields": {
-                        "recent_usage_count": {"$size": "$usage_history"},
-                        "last_used": {"$max": "$usage_history.使用日"},
-                    }
-                },
-                {"$sort": {"recent_usage_count": -1, "資材名": 1}},
-                {"$limit": 10},
+                *self._PESTICIDE_TAIL,
             ]
 
             recommendations = await self.db_pool.aggregate_cached(
@@ -205,34 +290,28 @@ class OptimizedAgriDatabase(AgriDatabase):
     async def get_recent_material_usage(self, field_name: str, days: int = 30) -> List[Dict[str, Any]]:
         """最近の資材使用履歴を取得（最適化版）"""
         try:
-            # 圃場IDを取得
-            field_data = await self.db_pool.find_one_cached(
-                self.COLLECTIONS["fields"], {"圃場名": field_name}, {"圃場ID": 1}
-            )
+            start_date = (date.today() - timedelta(days=days)).isoformat()
 
-            if not field_data:
-                return []
-
-            field_id = field_data.get("圃場ID")
-            start_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-
-            # 資材使用記録を取得
+            # 圃場の特定と資材使用記録の取得を1回の集約で実行
             pipeline = [
-                {"$match": {"圃場": field_id, "使用日": {"$gte": start_date}}},
+                {"$match": {"圃場名": field_name}},
+                {"$limit": 1},
                 {
                     "$lookup": {
-                        "from": "資材データ",
-                        "localField": "資材名",
-                        "foreignField": "資材名",
-                        "as": "material_info",
+                        "from": "資材使用記録",
+                        "let": {"field_id": "$圃場ID"},
+                        "pipeline": [
+                            {"$match": {"$expr": {"$eq": ["$圃場", "$$field_id"]}, "使用日": {"$gte": start_date}}},
+                            *self._MATERIAL_INFO_STAGES,
+                        ],
+                        "as": "usage",
                     }
                 },
-                {"$addFields": {"資材分類": {"$arrayElemAt": ["$material_info.資材分類", 0]}}},
-                {"$sort": {"使用日": -1}},
+                *self._MATERIAL_USAGE_TAIL,
             ]
 
             usage_records = await self.db_pool.aggregate_cached(
-                self.COLLECTIONS["material_usage"], pipeline, use_cache=True
+                self.COLLECTIONS["fields"], pipeline, use_cache=True
             )
 
             logger.info(f"Retrieved {len(usage_records)} material usage records for {field_name}")
@@ -252,7 +331,7 @@ class OptimizedAgriDatabase(AgriDatabase):
             update_data = {
                 "$set": {
                     "ステータス": "✅ 完了",
-                    "完了日": datetime.now().strftime("%Y-%m-%d"),
+                    "完了日": date.today().isoformat(),
                     **completion_data,
                 }
             }
@@ -262,6 +341,8 @@ class OptimizedAgriDatabase(AgriDatabase):
             )
 
             if success:
+                # どの担当者・日付のタスクか分からないため全件破棄する
+                self._today_tasks_cache.clear()
                 logger.info(f"Task completed successfully: {task_id}")
             else:
                 logger.warning(f"Task not found or not updated: {task_id}")
@@ -288,21 +369,27 @@ class OptimizedAgriDatabase(AgriDatabase):
                 raise DatabaseQueryError(f"圃場が見つかりません: {field_name}")
 
             # 次回実施日を計算
-            next_date = (datetime.now() + timedelta(days=days_offset)).strftime("%Y-%m-%d")
+            now = datetime.now()
+            today = now.date()
+            next_date = (today + timedelta(days=days_offset)).isoformat()
 
             # 新しいタスクを作成
             new_task = {
-                "作業計画ID": f"AUTO_{field_name}_{task_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                "作業計画ID": f"AUTO_{field_name}_{task_type}_{now:%Y%m%d_%H%M%S}",
                 "タスク名": f"{task_type}({days_offset}日後)",
                 "圃場": field_data["圃場ID"],
                 "予定日": next_date,
                 "ステータス": "🗓️ 予定",
-                "作成日": datetime.now().strftime("%Y-%m-%d"),
+                "作成日": today.isoformat(),
                 "自動生成": True,
             }
 
-            task_id = await self.db_pool.insert_one(self.COLLECTIONS["tasks"], new_task)
+            # 自動生成タスクは書き込み確認を待たない（_id はクライアント側で採番される）
+            task_id = await self.db_pool.insert_one(
+                self.COLLECTIONS["tasks"], new_task, write_concern=WriteConcern(w=0)
+            )
 
+            self._today_tasks_cache.clear()
             logger.info(f"Next task scheduled: {task_id} for {field_name} on {next_date}")
             return task_id
 
@@ -317,15 +404,22 @@ class OptimizedAgriDatabase(AgriDatabase):
         """データベース統計を取得"""
         try:
             stats = {}
+            await self.db_pool.ensure_connection()
+
+            # 件数はメタデータから推定値を取得し、全コレクション分を並行して問い合わせる
+            counts = await asyncio.gather(
+                *(
+                    self.db_pool.get_collection(collection_name).estimated_document_count()
+                    for collection_name in self.COLLECTIONS.values()
+                ),
+                return_exceptions=True,
+            )
 
-            for name, collection_name in self.COLLECTIONS.items():
-                try:
-                    collection = await self.db_pool.get_collection(collection_name)
-                    count = await collection.count_documents({})
-                    stats[name] = count
-                except Exception as e:
-                    logger.warning(f"Failed to get stats for {collection_name}: {e}")
-                    stats[name] = -1
+            for (name, collection_name), count in zip(self.COLLECTIONS.items(), counts):
+                if isinstance(count, Exception):
+                    logger.warning(f"Failed to get stats for {collection_name}: {count}")
+                    count = -1
+                stats[name] = count
 
             # キャッシュ統計も追加
             stats["cache_stats"] = self.db_pool.get_cache_stats()
@@ -338,5 +432,7 @@ class OptimizedAgriDatabase(AgriDatabase):
 
     async def clear_cache(self):
         """キャッシュをクリア"""
+        self._today_tasks_cache.clear()
+        self._field_status_cache.clear()
         self.db_pool.clear_cache()
         logger.info("Database cache cleared")
@@ -2,116 +2,184 @@
 農業AI システム用カスタム例外クラス
 """
 
-from typing import Optional, Dict, Any
+import sys
+from enum import IntEnum
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Union
+
+
+class ErrCode(IntEnum):
+    """エラーコード（値は _MSGS のインデックス）"""
+    DB_CONNECTION_ERROR = 0
+    DB_QUERY_ERROR = 1
+    AGENT_PROCESSING_ERROR = 2
+    VALIDATION_ERROR = 3
+    CONFIG_ERROR = 4
+    LINEBOT_ERROR = 5
+    NLP_PROCESSING_ERROR = 6
+    API_ERROR = 7
+    AUTH_ERROR = 8
+    RATE_LIMIT_ERROR = 9
+    TIMEOUT_ERROR = 10
+    GENERAL_ERROR = 11
 
 
 class AgriAIException(Exception):
     """農業AI基底例外"""
     
-    def __init__(self, message: str, error_code: Optional[str] = None, context: Optional[Dict[str, Any]] = None):
+    __slots__ = ("message", "error_code", "context")
+    
+    def __init__(
+        self,
+        message: str,
+        error_code: Optional[Union[ErrCode, str]] = None,
+        context: Optional[Dict[str, Any]] = None
+    ):
         super().__init__(message)
         self.message = message
-        self.error_code = error_code
+        # 文字列コードは intern して、コード名との比較・辞書参照を同一性判定で済ませる
+        self.error_code = sys.intern(error_code) if type(error_code) is str else error_code
         self.context = context or {}
     
     def __str__(self) -> str:
         return self.message
+    
+    def __reduce__(self):
+        # スロット属性は __dict__ に入らないため、pickle 用に状態として渡す
+        return (
+            self.__class__,
+            self.args,
+            {"message": self.message, "error_code": self.error_code, "context": self.context},
+        )
 
 
 class DatabaseConnectionError(AgriAIException):
     """データベース接続エラー"""
     
-    def __init__(self, message: str = "データベースとの接続に問題があります", **kwargs):
-        super().__init__(message, error_code="DB_CONNECTION_ERROR", **kwargs)
+    __slots__ = ()
+    
+    def __init__(self, message: str = "データベースとの接続に問題があります", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.DB_CONNECTION_ERROR, context)
 
 
 class DatabaseQueryError(AgriAIException):
     """データベースクエリエラー"""
     
-    def __init__(self, message: str = "データベースクエリでエラーが発生しました", **kwargs):
-        super().__init__(message, error_code="DB_QUERY_ERROR", **kwargs)
+    __slots__ = ()
+    
+    def __init__(self, message: str = "データベースクエリでエラーが発生しました", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.DB_QUERY_ERROR, context)
 
 
 class AgentProcessingError(AgriAIException):
     """エージェント処理エラー"""
     
-    def __init__(self, message: str = "AI処理中にエラーが発生しました", **kwargs):
-        super().__init__(message, error_code="AGENT_PROCESSING_ERROR", **kwargs)
+    __slots__ = ()
+    
+    def __init__(self, message: str = "AI処理中にエラーが発生しました", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.AGENT_PROCESSING_ERROR, context)
 
 
 class ValidationError(AgriAIException):
     """バリデーションエラー"""
     
-    def __init__(self, message: str = "入力内容に問題があります", **kwargs):
-        super().__init__(message, error_code="VALIDATION_ERROR", **kwargs)
+    __slots__ = ()
+    
+    def __init__(self, message: str = "入力内容に問題があります", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.VALIDATION_ERROR, context)
 
 
 class ConfigurationError(AgriAIException):
     """設定エラー"""
     
-    def __init__(self, message: str = "設定に問題があります", **kwargs):
-        super().__init__(message, error_code="CONFIG_ERROR", **kwargs)
+    __slots__ = ()
+    
+    def __init__(self, message: str = "設定に問題があります", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.CONFIG_ERROR, context)
 
 
 class LINEBotError(AgriAIException):
     """LINE Bot エラー"""
     
-    def __init__(self, message: str = "LINE Bot処理中にエラーが発生しました", **kwargs):
-        super().__init__(message, error_code="LINEBOT_ERROR", **kwargs)
+    __slots__ = ()
+    
+    def __init__(self, message: str = "LINE Bot処理中にエラーが発生しました", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.LINEBOT_ERROR, context)
 
 
 class NLPProcessingError(AgriAIException):
     """自然言語処理エラー"""
     
-    def __init__(self, message: str = "自然言語処理でエラーが発生しました", **kwargs):
-        super().__init__(message, error_code="NLP_PROCESSING_ERROR", **kwargs)
+    __slots__ = ()
+    
+    def __init__(self, message: str = "自然言語処理でエラーが発生しました", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.NLP_PROCESSING_ERROR, context)
 
 
 class APIError(AgriAIException):
     """外部API呼び出しエラー"""
     
-    def __init__(self, message: str = "外部API呼び出しでエラーが発生しました", **kwargs):
-        super().__init__(message, error_code="API_ERROR", **kwargs)
+    __slots__ = ()
+    
+    def __init__(self, message: str = "外部API呼び出しでエラーが発生しました", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.API_ERROR, context)
 
 
 class AuthenticationError(AgriAIException):
     """認証エラー"""
     
-    def __init__(self, message: str = "認証に失敗しました", **kwargs):
-        super().__init__(message, error_code="AUTH_ERROR", **kwargs)
+    __slots__ = ()
+    
+    def __init__(self, message: str = "認証に失敗しました", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.AUTH_ERROR, context)
 
 
 class RateLimitError(AgriAIException):
     """レート制限エラー"""
     
-    def __init__(self, message: str = "レート制限に達しました", **kwargs):
-        super().__init__(message, error_code="RATE_LIMIT_ERROR", **kwargs)
+    __slots__ = ()
+    
+    def __init__(self, message: str = "レート制限に達しました", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.RATE_LIMIT_ERROR, context)
 
 
 class TimeoutError(AgriAIException):
     """タイムアウトエラー"""
     
-    def __init__(self, message: str = "処理がタイムアウトしました", **kwargs):
-        super().__init__(message, error_code="TIMEOUT_ERROR", **kwargs)
-
-
-# エラーコードとメッセージのマッピング
-ERROR_MESSAGES = {
-    "DB_CONNECTION_ERROR": "データベースとの接続に問題があります。しばらくしてからお試しください。",
-    "DB_QUERY_ERROR": "データベースクエリでエラーが発生しました。もう一度お試しください。",
-    "AGENT_PROCESSING_ERROR": "AI処理中にエラーが発生しました。もう一度お試しください。",
-    "VALIDATION_ERROR": "入力内容に問題があります。確認してください。",
-    "CONFIG_ERROR": "システム設定に問題があります。管理者にお問い合わせください。",
-    "LINEBOT_ERROR": "LINE Bot処理中にエラーが発生しました。もう一度お試しください。",
-    "NLP_PROCESSING_ERROR": "メッセージの解析でエラーが発生しました。もう一度お試しください。",
-    "API_ERROR": "外部API呼び出しでエラーが発生しました。しばらくしてからお試しください。",
-    "AUTH_ERROR": "認証に失敗しました。設定を確認してください。",
-    "RATE_LIMIT_ERROR": "利用制限に達しました。しばらくしてからお試しください。",
-    "TIMEOUT_ERROR": "処理がタイムアウトしました。もう一度お試しください。",
-    "GENERAL_ERROR": "申し訳ございません。システムエラーが発生しました。"
-}
-
-
-def get_user_friendly_message(error_code: str) -> str:
+    __slots__ = ()
+    
+    def __init__(self, message: str = "処理がタイムアウトしました", context: Optional[Dict[str, Any]] = None):
+        super().__init__(message, ErrCode.TIMEOUT_ERROR, context)
+
+
+# エラーコードの値の順に並べたユーザー向けメッセージ
+_MSGS = (
+    "データベースとの接続に問題があります。しばらくしてからお試しください。",
+    "データベースクエリでエラーが発生しました。もう一度お試しください。",
+    "AI処理中にエラーが発生しました。もう一度お試しください。",
+    "入力内容に問題があります。確認してください。",
+    "システム設定に問題があります。管理者にお問い合わせください。",
+    "LINE Bot処理中にエラーが発生しました。もう一度お試しください。",
+    "メッセージの解析でエラーが発生しました。もう一度お試しください。",
+    "外部API呼び出しでエラーが発生しました。しばらくしてからお試しください。",
+    "認証に失敗しました。設定を確認してください。",
+    "利用制限に達しました。しばらくしてからお試しください。",
+    "処理がタイムアウトしました。もう一度お試しください。",
+    "申し訳ございません。システムエラーが発生しました。",
+)
+_GENERAL_MSG = _MSGS[ErrCode.GENERAL_ERROR]
+
+# エラーコード名とメッセージのマッピング（文字列コードでの参照用、読み取り専用）
+ERROR_MESSAGES = MappingProxyType({code.name: _MSGS[code] for code in ErrCode})
+
+# 数値コード・コード名のどちらでも1回の dict 参照で引けるマッピング
+_MSG_LOOKUP = {**{int(code): _MSGS[code] for code in ErrCode}, **ERROR_MESSAGES}
+
+
+def get_user_friendly_message(
+    error_code: Optional[Union[ErrCode, str]],
+    _lookup: Dict[Any, str] = _MSG_LOOKUP,
+    _general: str = _GENERAL_MSG
+) -> str:
     """ユーザーフレンドリーなエラーメッセージを取得"""
-    return ERROR_MESSAGES.get(error_code, ERROR_MESSAGES["GENERAL_ERROR"])
\ No newline at end of file
+    return _lookup.get(error_code, _general)
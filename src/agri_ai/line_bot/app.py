@@ -3,49 +3,98 @@ LINE Bot application for Agricultural AI Agent.
 """
 
 import asyncio
+import base64
+import hashlib
+import hmac
 import logging
-from typing import Dict, Any
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, Any, List, Optional, Set, Tuple
 from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import aiohttp
+import orjson
 
 from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
-from linebot import LineBotApi, WebhookHandler
-from linebot.exceptions import InvalidSignatureError, LineBotApiError
+from fastapi.responses import JSONResponse, ORJSONResponse
+from linebot import AsyncLineBotApi, LineBotApi
+from linebot.aiohttp_async_http_client import AiohttpAsyncHttpClient
 from linebot.models import (
-    MessageEvent, TextMessage, TextSendMessage, 
+    MessageEvent, TextMessage,
     FollowEvent, UnfollowEvent, JoinEvent, LeaveEvent
 )
 
-from ..core.agent import AgentManager, OptimizedAgentManager
-from ..core.database import MongoDBClient, AgriDatabase
-from ..core.database_pool import get_database_pool
-from ..core.optimized_database import OptimizedAgriDatabase
-from ..core.agent_pool import get_agent_pool
 from ..utils.config import get_settings
-from .message_handler import LineMessageHandler, OptimizedLineMessageHandler
-from .utils import format_agent_response, create_error_message
+from .message_handler import OptimizedLineMessageHandler
+
+if TYPE_CHECKING:
+    # core 配下（LLM・DB ドライバー）は起動時に lifespan 内で読み込む
+    from ..core.agent import AgentManager
+    from ..core.database import MongoDBClient
+    from ..core.optimized_database import OptimizedAgriDatabase
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global variables
-agent_manager: AgentManager = None
-message_handler: LineMessageHandler = None
-line_bot_api: LineBotApi = None
-webhook_handler: WebhookHandler = None
-mongo_client: MongoDBClient = None
+
+@dataclass(slots=True)
+class BotState:
+    """アプリケーション全体で共有する Bot の状態"""
+    agent_manager: Optional["AgentManager"] = None
+    message_handler: Optional[OptimizedLineMessageHandler] = None
+    line_bot_api: Optional[LineBotApi] = None
+    # メッセージハンドラーの非同期 LINE API クライアントが使う HTTP セッション
+    http_session: Optional[aiohttp.ClientSession] = None
+    mongo_client: Optional["MongoDBClient"] = None
+    optimized_db: Optional["OptimizedAgriDatabase"] = None
+    # 署名検証用にチャネルシークレットで鍵設定済みの HMAC（リクエストごとに copy して使う）
+    signature_hmac: Optional[hmac.HMAC] = None
+    event_queue: Optional[asyncio.Queue] = None
+    event_workers: List[asyncio.Task] = field(default_factory=list)
+    # イベントを処理中のワーカー数
+    busy_workers: int = 0
+    # キューに積めなかったイベントへのエラー返信タスク（完了まで参照を保持する）
+    error_reply_tasks: Set[asyncio.Task] = field(default_factory=set)
+    # 直近のヘルスチェック結果 (monotonic 時刻, レスポンス)
+    last_health: Optional[Tuple[float, JSONResponse]] = None
+
+
+# 共有状態（lifespan で初期化し、app.state.bot からも参照できる）
+_state = BotState()
+
+# Webhook イベント種別 → イベントクラス
+_EVENT_CLASSES = {
+    "message": MessageEvent,
+    "follow": FollowEvent,
+    "unfollow": UnfollowEvent,
+    "join": JoinEvent,
+    "leave": LeaveEvent,
+}
+
+# Webhook イベント処理キュー（固定数のワーカーで処理し、イベントごとのタスク生成を避ける）
+EVENT_QUEUE_SIZE = 1024
+EVENT_WORKERS = 16
+
+# ヘルスチェック結果を再利用する秒数
+HEALTH_CHECK_INTERVAL = 5.0
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
-    global agent_manager, message_handler, line_bot_api, webhook_handler, mongo_client
+    state = app.state.bot = _state
     
     # Startup
     logger.info("🚀 Starting Agricultural AI LINE Bot...")
     
     try:
+        from ..core.agent import OptimizedAgentManager
+        from ..core.agent_pool import get_agent_pool
+        from ..core.database_pool import get_database_pool
+        from ..core.optimized_database import OptimizedAgriDatabase
+        
         # Load settings
         settings = get_settings()
         
@@ -54,25 +103,30 @@ async def lifespan(app: FastAPI):
             raise ValueError("LINE Bot credentials are not configured")
         
         # Initialize LINE Bot API
-        line_bot_api = LineBotApi(settings.line_channel_access_token)
-        webhook_handler = WebhookHandler(settings.line_channel_secret)
+        state.line_bot_api = LineBotApi(settings.line_channel_access_token)
+        state.signature_hmac = hmac.new(settings.line_channel_secret.encode('utf-8'), digestmod=hashlib.sha256)
         
         # Initialize optimized database pool
         db_pool = await get_database_pool()
-        optimized_db = OptimizedAgriDatabase(db_pool)
+        state.optimized_db = OptimizedAgriDatabase(db_pool)
         
         # Initialize agent pool
         agent_pool = await get_agent_pool()
         
         # Initialize optimized agent manager
-        agent_manager = OptimizedAgentManager(agent_pool)
+        state.agent_manager = OptimizedAgentManager(agent_pool)
         
-        # Initialize optimized message handler
-        message_handler = OptimizedLineMessageHandler(agent_manager, line_bot_api)
-        await message_handler.initialize()
+        # Initialize optimized message handler（返信は非同期クライアントで送信）
+        state.http_session = aiohttp.ClientSession()
+        async_line_bot_api = AsyncLineBotApi(
+            settings.line_channel_access_token, AiohttpAsyncHttpClient(state.http_session)
+        )
+        state.message_handler = OptimizedLineMessageHandler(state.agent_manager, async_line_bot_api)
+        await state.message_handler.initialize()
         
-        # Setup webhook handlers
-        setup_webhook_handlers()
+        # Start webhook event workers
+        state.event_queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        state.event_workers.extend(asyncio.create_task(_event_worker()) for _ in range(EVENT_WORKERS))
         
         logger.info("✅ Agricultural AI LINE Bot started successfully!")
         
@@ -85,9 +139,18 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("🛑 Shutting down Agricultural AI LINE Bot...")
     
+    # Stop webhook event workers
+    for worker in state.event_workers:
+        worker.cancel()
+    await asyncio.gather(*state.event_workers, return_exceptions=True)
+    state.event_workers.clear()
+    await asyncio.gather(*state.error_reply_tasks, return_exceptions=True)
+    
     # Shutdown message handler
-    if message_handler:
-        await message_handler.shutdown()
+    if state.message_handler:
+        await state.message_handler.shutdown()
+    if state.http_session:
+        await state.http_session.close()
     
     # Shutdown agent pool
     from ..core.agent_pool import shutdown_agent_pool
@@ -105,33 +168,91 @@ app = FastAPI(
     title="Agricultural AI LINE Bot",
     description="LINE Bot interface for Agricultural AI Agent",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# 固定レスポンス（リクエストごとに JSON エンコードしない）
+_ROOT_RESPONSE = JSONResponse({"message": "Agricultural AI LINE Bot is running!"})
+_OK_RESPONSE = JSONResponse({"status": "ok"})
+_HEALTHY_RESPONSE = JSONResponse({"status": "healthy"})
+_UNHEALTHY_RESPONSE = JSONResponse({"detail": "Service unavailable"}, status_code=503)
+
 
 @app.get("/")
 async def root():
     """Root endpoint."""
-    return {"message": "Agricultural AI LINE Bot is running!"}
+    return _ROOT_RESPONSE
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
+    """Health check endpoint (cached for ``HEALTH_CHECK_INTERVAL`` seconds)."""
+    state = _state
+    now = time.monotonic()
+    if state.last_health and now - state.last_health[0] < HEALTH_CHECK_INTERVAL:
+        return state.last_health[1]
+    
     try:
         # Check database connection
-        if mongo_client:
-            await mongo_client.db.command("ping")
+        if state.mongo_client:
+            await state.mongo_client.db.command("ping")
         
-        # Check LINE Bot API
-        if line_bot_api:
-            line_bot_api.get_bot_info()
+        # Check LINE Bot API（同期 HTTP 呼び出しのためスレッドで実行）
+        if state.line_bot_api:
+            await asyncio.to_thread(state.line_bot_api.get_bot_info)
         
-        return {"status": "healthy"}
+        response = _HEALTHY_RESPONSE
     
     except Exception as e:
         logger.error(f"Health check failed: {e}")
-        raise HTTPException(status_code=503, detail="Service unavailable")
+        response = _UNHEALTHY_RESPONSE
+    
+    state.last_health = (now, response)
+    return response
+
+
+# ASGI のヘッダー名は小文字の bytes で渡される
+_SIGNATURE_HEADER = b"x-line-signature"
+
+
+def _get_signature(request: Request) -> bytes:
+    """生ヘッダーから X-Line-Signature を取り出す（見つからなければ空）"""
+    for name, value in request.headers.raw:
+        if name == _SIGNATURE_HEADER:
+            return value
+    return b""
+
+
+def _verify_signature(body: bytes, signature: bytes) -> bool:
+    """X-Line-Signature を検証（鍵設定済み HMAC を複製して使う）"""
+    mac = _state.signature_hmac.copy()
+    mac.update(body)
+    return hmac.compare_digest(base64.b64encode(mac.digest()), signature)
+
+
+def _dispatch_event(event: Any) -> None:
+    """イベントを対応するハンドラーに渡す（テキスト以外のメッセージは無視）"""
+    if isinstance(event, MessageEvent) and not isinstance(event.message, TextMessage):
+        return
+    
+    handler = _EVENT_HANDLERS.get(type(event))
+    if handler is None:
+        logger.info(f"Unhandled event type: {type(event).__name__}")
+        return
+    
+    handler(event)
+
+
+def _dispatch_events(body: bytes) -> None:
+    """署名検証済みのリクエストボディからイベントを生成し、ハンドラーに渡す"""
+    for event_data in orjson.loads(body).get("events", []):
+        event_class = _EVENT_CLASSES.get(event_data.get("type"))
+        if event_class is None:
+            logger.info(f"Unhandled event type: {event_data.get('type')}")
+            continue
+        
+        _dispatch_event(event_class.new_from_json_dict(event_data))
 
 
 @app.post("/webhook")
@@ -139,107 +260,144 @@ async def line_webhook(request: Request, background_tasks: BackgroundTasks):
     """LINE Bot webhook endpoint."""
     try:
         # Get request signature
-        signature = request.headers.get('X-Line-Signature', '')
+        signature = _get_signature(request)
         
-        # Get request body
+        # Get request body (bytes のまま検証・パースする)
         body = await request.body()
-        body_text = body.decode('utf-8')
         
-        logger.info(f"📥 Webhook received: {body_text[:200]}...")
-        logger.info(f"🔑 Signature: {signature[:20]}...")
+        logger.info("📥 Webhook received: %s...", body[:200].decode("utf-8", "replace"))
+        logger.info("🔑 Signature: %s...", signature[:20].decode("ascii", "replace"))
+        
+        # 署名検証用の鍵は lifespan で設定される
+        if _state.signature_hmac is None:
+            raise HTTPException(status_code=503, detail="LINE Bot not initialized")
         
         # Handle webhook
-        try:
-            webhook_handler.handle(body_text, signature)
-            logger.info("✅ Webhook handled successfully")
-        except InvalidSignatureError:
+        if not _verify_signature(body, signature):
             logger.error("❌ Invalid signature")
             raise HTTPException(status_code=400, detail="Invalid signature")
+        _dispatch_events(body)
+        logger.info("✅ Webhook handled successfully")
         
-        return JSONResponse({"status": "ok"})
+        return _OK_RESPONSE
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Webhook error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-def setup_webhook_handlers():
-    """Setup webhook handlers after initialization."""
-    global webhook_handler, message_handler, line_bot_api
-    
-    @webhook_handler.add(MessageEvent, message=TextMessage)
-    def handle_text_message(event: MessageEvent):
-        """Handle text messages."""
-        try:
-            logger.info(f"💬 Text message received: {event.message.text}")
-            logger.info(f"👤 User ID: {event.source.user_id}")
-            
-            # Process message in background
-            asyncio.create_task(message_handler.handle_text_message(event))
-            
-        except Exception as e:
-            logger.error(f"❌ Error handling text message: {e}")
-            
-            # Send error message
-            try:
-                error_message = create_error_message()
-                line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text=error_message)
-                )
-            except LineBotApiError as api_error:
-                logger.error(f"❌ Failed to send error message: {api_error}")
-
-    @webhook_handler.add(FollowEvent)
-    def handle_follow(event: FollowEvent):
-        """Handle follow events."""
+async def _event_worker():
+    """キューから (ハンドラー, イベント) を取り出して処理するワーカー"""
+    queue = _state.event_queue
+    while True:
+        handler, event = await queue.get()
+        _state.busy_workers += 1
         try:
-            asyncio.create_task(message_handler.handle_follow_event(event))
+            await handler(event)
         except Exception as e:
-            logger.error(f"Error handling follow event: {e}")
+            logger.error(f"❌ Error processing webhook event: {e}")
+        finally:
+            _state.busy_workers -= 1
+            queue.task_done()
 
-    @webhook_handler.add(UnfollowEvent)
-    def handle_unfollow(event: UnfollowEvent):
-        """Handle unfollow events."""
-        try:
-            asyncio.create_task(message_handler.handle_unfollow_event(event))
-        except Exception as e:
-            logger.error(f"Error handling unfollow event: {e}")
 
-    @webhook_handler.add(JoinEvent)
-    def handle_join(event: JoinEvent):
-        """Handle join events."""
-        try:
-            asyncio.create_task(message_handler.handle_join_event(event))
-        except Exception as e:
-            logger.error(f"Error handling join event: {e}")
+def _enqueue_event(handler: Callable, event: Any) -> None:
+    """イベントを処理キューに追加（満杯なら asyncio.QueueFull）"""
+    _state.event_queue.put_nowait((handler, event))
 
-    @webhook_handler.add(LeaveEvent)
-    def handle_leave(event: LeaveEvent):
-        """Handle leave events."""
-        try:
-            asyncio.create_task(message_handler.handle_leave_event(event))
-        except Exception as e:
-            logger.error(f"Error handling leave event: {e}")
+
+def _schedule_error_reply(event: Any) -> None:
+    """エラー返信をイベントループ上で非同期に送る（reply_token が無効なら multicast にまとめられる）"""
+    task = asyncio.get_running_loop().create_task(
+        _state.message_handler._send_error_message(event.reply_token, event.source.user_id)
+    )
+    _state.error_reply_tasks.add(task)
+    task.add_done_callback(_state.error_reply_tasks.discard)
+
+
+def handle_text_message(event: MessageEvent):
+    """Handle text messages."""
+    try:
+        message_text = event.message.text
+        user_id = event.source.user_id
+        logger.info(f"💬 Text message received: {message_text}")
+        logger.info(f"👤 User ID: {user_id}")
+        
+        # Process message in background
+        _enqueue_event(_state.message_handler.handle_text_message, event)
+        
+    except Exception as e:
+        logger.error(f"❌ Error handling text message: {e}")
+        
+        # Send error message
+        _schedule_error_reply(event)
+
+
+def handle_follow(event: FollowEvent):
+    """Handle follow events."""
+    try:
+        _enqueue_event(_state.message_handler.handle_follow_event, event)
+    except Exception as e:
+        logger.error(f"Error handling follow event: {e}")
+
+
+def handle_unfollow(event: UnfollowEvent):
+    """Handle unfollow events."""
+    try:
+        _enqueue_event(_state.message_handler.handle_unfollow_event, event)
+    except Exception as e:
+        logger.error(f"Error handling unfollow event: {e}")
+
+
+def handle_join(event: JoinEvent):
+    """Handle join events."""
+    try:
+        _enqueue_event(_state.message_handler.handle_join_event, event)
+    except Exception as e:
+        logger.error(f"Error handling join event: {e}")
+
+
+def handle_leave(event: LeaveEvent):
+    """Handle leave events."""
+    try:
+        _enqueue_event(_state.message_handler.handle_leave_event, event)
+    except Exception as e:
+        logger.error(f"Error handling leave event: {e}")
+
+
+# イベントクラス → ハンドラー
+_EVENT_HANDLERS: Dict[type, Callable] = {
+    MessageEvent: handle_text_message,
+    FollowEvent: handle_follow,
+    UnfollowEvent: handle_unfollow,
+    JoinEvent: handle_join,
+    LeaveEvent: handle_leave,
+}
 
 
 @app.get("/stats")
 async def get_stats():
     """Get comprehensive bot statistics."""
+    state = _state
     try:
-        if not agent_manager:
+        if not state.agent_manager:
             raise HTTPException(status_code=503, detail="Agent manager not initialized")
         
         # エージェント統計
-        agent_stats = agent_manager.get_agent_stats()
+        agent_stats = state.agent_manager.get_agent_stats()
         
         # メッセージハンドラー統計
-        processing_stats = message_handler.get_processing_stats()
+        processing_stats = state.message_handler.get_processing_stats()
+        processing_stats["queue_size"] = state.event_queue.qsize() if state.event_queue else 0
+        # 同時処理数の上限はワーカー数
+        processing_stats["available_slots"] = len(state.event_workers) - state.busy_workers
         
         # データベース統計
         db_stats = {}
-        if hasattr(optimized_db, 'get_database_stats'):
-            db_stats = await optimized_db.get_database_stats()
+        if hasattr(state.optimized_db, 'get_database_stats'):
+            db_stats = await state.optimized_db.get_database_stats()
         
         return {
             "status": "ok",
@@ -257,6 +415,7 @@ async def get_stats():
 @app.get("/stats/user/{user_id}")
 async def get_user_stats(user_id: str):
     """Get user-specific statistics."""
+    message_handler = _state.message_handler
     try:
         if not message_handler:
             raise HTTPException(status_code=503, detail="Message handler not initialized")
@@ -281,14 +440,15 @@ async def get_user_stats(user_id: str):
 @app.post("/admin/cache/clear")
 async def clear_cache():
     """Clear all caches."""
+    state = _state
     try:
         # メッセージハンドラーのキャッシュをクリア
-        if message_handler:
-            message_handler.clear_cache()
+        if state.message_handler:
+            await state.message_handler.clear_cache()
         
         # データベースキャッシュをクリア
-        if hasattr(optimized_db, 'clear_cache'):
-            await optimized_db.clear_cache()
+        if hasattr(state.optimized_db, 'clear_cache'):
+            await state.optimized_db.clear_cache()
         
         return {"status": "ok", "message": "Caches cleared successfully"}
     
@@ -317,13 +477,17 @@ async def admin_broadcast(request: Request):
 
 
 if __name__ == "__main__":
+    import os
     import uvicorn
     
-    # Development server
+    # uvloop / httptools で起動（会話メモリ・レート制限はプロセス内のため、既定は1ワーカー）
     uvicorn.run(
         "agri_ai.line_bot.app:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        loop="uvloop",
+        http="httptools",
+        reload=False,
+        workers=int(os.getenv("LINE_BOT_WORKERS", "1")),
         log_level="info"
     )
\ No newline at end of file
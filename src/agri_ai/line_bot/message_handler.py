@@ -5,29 +5,180 @@ Optimized message handler for LINE Bot.
 import asyncio
 import logging
 import time
-from typing import Dict, Any, Optional, List, Union
-from datetime import datetime, timedelta
-from dataclasses import dataclass
+from collections import defaultdict, deque
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Deque, Dict, Any, Mapping, Optional, List, Set, Union
+from datetime import datetime
+from dataclasses import asdict, dataclass
 
-from linebot import LineBotApi
+import xxhash
+from cachetools import TTLCache
+from linebot import AsyncLineBotApi, LineBotApi
 from linebot.exceptions import LineBotApiError
 from linebot.models import (
-    MessageEvent, TextMessage, TextSendMessage,
+    MessageEvent, TextSendMessage,
     FollowEvent, UnfollowEvent, JoinEvent, LeaveEvent
 )
 
-from ..core.agent import AgentManager, OptimizedAgentManager
-from ..core.agent_pool import get_agent_pool
-from ..exceptions import LINEBotError, ValidationError
-from ..utils.error_handling import LINEBotErrorHandler, error_handler
+from ..utils.error_handling import LINEBotErrorHandler
 from ..utils.config import get_settings
 from .utils import (
-    format_agent_response, create_welcome_message, create_error_message,
+    format_agent_response, create_welcome_message, create_error_message, create_help_message,
     parse_command, clean_message, is_work_report
 )
 
+if TYPE_CHECKING:
+    # core.agent は LLM ライブラリを読み込むため、型チェック時のみインポートする
+    from ..core.agent import AgentManager, OptimizedAgentManager
+    from redis.asyncio import Redis
+
 logger = logging.getLogger(__name__)
 
+# 定型の返信メッセージ（送信時に変更されないため、失敗のたびに生成せず使い回す）
+ERROR_REPLY = TextSendMessage(text=create_error_message())
+RATE_LIMIT_REPLY = TextSendMessage(text="メッセージの送信が多すぎます。しばらく待ってから再度お試しください。")
+VALIDATION_ERROR_REPLY = TextSendMessage(text="メッセージの形式が正しくありません。もう一度お試しください。")
+
+# 定型の返信テキスト
+GROUP_WELCOME_MESSAGE = """こんにちは！農業AIアシスタントです🌾
+
+グループでご利用いただきありがとうございます。
+
+主な機能：
+• 今日の作業確認
+• 作業報告の記録
+• 圃場情報の確認
+• 農薬・資材の推奨
+
+何かご質問がありましたら、お気軽にお声がけください！"""
+RESET_MESSAGE = "会話履歴をリセットしました。"
+UNKNOWN_COMMAND_MESSAGE = "不明なコマンドです。"
+STATUS_TEMPLATE = """📊 ユーザー状況:
+メッセージ数: {message_count}
+最終活動: {last_activity}
+セッション開始: {first_interaction}"""
+STATUS_EMPTY_MESSAGE = STATUS_TEMPLATE.format(message_count=0, last_activity="N/A", first_interaction="N/A")
+
+# multicast の1リクエストあたりの最大宛先数（LINE Messaging API の上限）
+MULTICAST_MAX_RECIPIENTS = 500
+
+# Redis 上のレスポンスキャッシュのキー接頭辞と、クリア時に1回で削除するキー数
+RESPONSE_CACHE_PREFIX = "resp:"
+CACHE_CLEAR_BATCH_SIZE = 500
+
+# セッション再利用プールの上限
+SESSION_POOL_SIZE = 256
+
+# reply_message / push_message 1回で送れる最大メッセージ数（LINE Messaging API の上限）
+REPLY_MAX_MESSAGES = 5
+
+LineApi = Union[LineBotApi, AsyncLineBotApi]
+
+# スライディングウィンドウのレート制限（上限未満のときだけ記録するため、拒否したリクエストは数えない）
+# KEYS[1]: キー, ARGV: 現在時刻, ウィンドウ秒数, 上限回数, メンバー
+_RATE_LIMIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('EXPIRE', KEYS[1], window)
+return 1
+"""
+
+
+async def _call_line_api(line_bot_api: LineApi, method: str, *args):
+    """LINE API を呼び出す（同期クライアントの場合はスレッドで実行してイベントループを塞がない）"""
+    func = getattr(line_bot_api, method)
+    if isinstance(line_bot_api, AsyncLineBotApi):
+        return await func(*args)
+    return await asyncio.to_thread(func, *args)
+
+
+def _is_invalid_reply_token(error: LineBotApiError) -> bool:
+    """reply_token が使用済み・期限切れで返信できなかったエラーか"""
+    message = error.error.message or ""
+    return error.status_code == 400 and "reply token" in message.lower()
+
+
+class _ErrorReplyBatcher:
+    """reply_token が使えなかったエラー通知をまとめて multicast で送信する"""
+
+    def __init__(self, line_bot_api: LineApi, interval: float = 0.05):
+        self.line_bot_api = line_bot_api
+        self.interval = interval
+        self._pending: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """送信タスクを開始"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """送信タスクを停止し、残りを送信"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def add(self, user_id: str):
+        """エラー通知の宛先を追加（同一ユーザーへの重複通知はまとめる）"""
+        self._pending.add(user_id)
+
+    async def flush(self):
+        """溜まった宛先へエラーメッセージを送信"""
+        if not self._pending:
+            return
+        user_ids = list(self._pending)
+        self._pending.clear()
+        for i in range(0, len(user_ids), MULTICAST_MAX_RECIPIENTS):
+            try:
+                await _call_line_api(
+                    self.line_bot_api, "multicast", user_ids[i:i + MULTICAST_MAX_RECIPIENTS], ERROR_REPLY
+                )
+            except Exception as e:
+                logger.error(f"❌ Failed to multicast error message: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+
+@dataclass(slots=True)
+class UserSession:
+    """ユーザーセッション（時刻は time.time() の値で保持）"""
+    user_name: str
+    first_interaction: float
+    last_activity: float
+    message_count: int = 0
+    last_message: str = ""
+    last_response: str = ""
+
+
+def _utf16_len(text: str) -> int:
+    """UTF-16 のコード単位数（LINE API の文字数カウント）"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _split_utf16(text: str, max_length: int) -> tuple:
+    """UTF-16 で max_length 単位以内の先頭部分と残りに分割"""
+    length = 0
+    for i, char in enumerate(text):
+        length += 2 if ord(char) > 0xFFFF else 1
+        if length > max_length:
+            return text[:i], text[i:]
+    return text, ""
+
+
+def _to_datetime(timestamp: Optional[float]) -> Optional[datetime]:
+    """セッションの時刻を表示用の datetime に変換"""
+    return datetime.fromtimestamp(timestamp) if timestamp is not None else None
+
 
 @dataclass
 class MessageProcessingStats:
@@ -39,122 +190,129 @@ class MessageProcessingStats:
     average_processing_time: float = 0.0
     work_reports_processed: int = 0
     commands_processed: int = 0
+    cache_hits: int = 0
 
 
 class OptimizedLineMessageHandler:
     """最適化されたLINE Bot メッセージハンドラー"""
     
-    def __init__(self, agent_manager: Union[AgentManager, OptimizedAgentManager], line_bot_api: LineBotApi):
+    def __init__(self, agent_manager: Union["AgentManager", "OptimizedAgentManager"], line_bot_api: LineApi):
         self.agent_manager = agent_manager
         self.line_bot_api = line_bot_api
         self.settings = get_settings()
         
         # セッション管理
-        self.user_sessions: Dict[str, Dict[str, Any]] = {}
+        self.user_sessions: Dict[str, UserSession] = {}
+        # 解放済みセッションの再利用プール（フォロー解除・再フォローでの再確保を避ける）
+        self._session_pool: List[UserSession] = []
         
         # 統計情報
         self.stats = MessageProcessingStats()
         
-        # メッセージキュー（負荷分散用）
-        self.message_queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
-        self.processing_tasks: List[asyncio.Task] = []
+        # 処理中のメッセージ数（同時実行数は呼び出し元のワーカー数で決まり、ここではタスクを作らない）
+        self._in_flight_messages = 0
         
         # レート制限
-        self.rate_limiter: Dict[str, List[datetime]] = {}
         self.rate_limit_window = 60  # 1分間
         self.rate_limit_count = 30   # 30メッセージ/分
+        # ユーザーごとの直近リクエスト時刻（time.monotonic()、古い順）
+        self.rate_limiter: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=self.rate_limit_count)
+        )
         
         # キャッシュ
-        self.response_cache: Dict[str, tuple] = {}  # (response, timestamp)
         self.cache_ttl = 300  # 5分
+        self.response_cache: TTLCache = TTLCache(maxsize=1000, ttl=self.cache_ttl)  # LRU + TTL
+        self.cache_min_processing_time = 0.05  # この秒数以上かかった応答のみキャッシュ
+        # LINE プロフィールの表示名（再フォロー時の API 呼び出しを省く）
+        self.profile_cache: TTLCache = TTLCache(maxsize=10000, ttl=3600)
+        
+        # エラー通知のまとめ送信
+        self.error_batcher = _ErrorReplyBatcher(line_bot_api)
+        
+        # 期限切れキャッシュ・休眠セッション・古いレート制限履歴の定期掃除
+        self.sweep_interval = 300  # 5分
+        self.session_ttl = 86400   # 24時間操作のないセッションを削除
+        self._sweep_task: Optional[asyncio.Task] = None
+        
+        # 共有ストア（REDIS_URL 設定時のみ。レート制限・レスポンスキャッシュをプロセス間で共有）
+        self.redis: Optional["Redis"] = None
+        self._rate_limit_script = None
     
     async def initialize(self):
         """ハンドラーを初期化"""
         logger.info("Initializing optimized LINE message handler...")
         
-        # バックグラウンドタスクを開始
-        for i in range(3):  # 3つの並列処理タスク
-            task = asyncio.create_task(self._process_message_queue())
-            self.processing_tasks.append(task)
+        if self.settings.redis_url:
+            import redis.asyncio as aioredis
+            self.redis = aioredis.from_url(self.settings.redis_url, decode_responses=True)
+            self._rate_limit_script = self.redis.register_script(_RATE_LIMIT_SCRIPT)
+            logger.info("Using Redis for rate limiting and response cache")
         
-        logger.info("LINE message handler initialized")
+        self.error_batcher.start()
+        self._sweep_task = asyncio.create_task(self._periodic_sweep())
+        
+        # uvicorn の loop 設定（uvloop）が効いているか確認できるようにループ実装を記録
+        loop = asyncio.get_running_loop()
+        logger.info(f"LINE message handler initialized (event loop: {type(loop).__module__})")
     
     async def shutdown(self):
         """ハンドラーをシャットダウン"""
         logger.info("Shutting down LINE message handler...")
         
-        # 処理タスクを停止
-        for task in self.processing_tasks:
-            task.cancel()
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            await asyncio.gather(self._sweep_task, return_exceptions=True)
+            self._sweep_task = None
+        
+        await self.error_batcher.stop()
         
-        # 残っているタスクを待機
-        if self.processing_tasks:
-            await asyncio.gather(*self.processing_tasks, return_exceptions=True)
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
         
         logger.info("LINE message handler shutdown complete")
     
     async def handle_text_message(self, event: MessageEvent):
-        """テキストメッセージをハンドル（キューに追加）"""
+        """テキストメッセージをハンドル（処理が終わるまで待つ。待ち行列は呼び出し元のキューが持つ）"""
+        self._in_flight_messages += 1
         try:
-            # メッセージをキューに追加
-            message_data = {
-                "type": "text_message",
-                "event": event,
-                "timestamp": datetime.now(),
-                "user_id": event.source.user_id,
-                "message_text": event.message.text
-            }
-            
-            await self.message_queue.put(message_data)
-            logger.debug(f"Message queued from {event.source.user_id}")
-            
-        except asyncio.QueueFull:
-            logger.error("Message queue is full, dropping message")
-            await self._send_error_message(event.reply_token)
+            await self._process_text_message(event)
         except Exception as e:
-            logger.error(f"Error queueing message: {e}")
-            await self._send_error_message(event.reply_token)
-    
-    async def _process_message_queue(self):
-        """メッセージキューを処理"""
-        while True:
-            try:
-                # メッセージをキューから取得
-                message_data = await self.message_queue.get()
-                
-                # メッセージを処理
-                await self._process_text_message(message_data)
-                
-                # タスク完了を通知
-                self.message_queue.task_done()
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Error processing message queue: {e}")
-                await asyncio.sleep(1)  # エラー時は少し待機
+            logger.error(f"Error processing message: {e}")
+        finally:
+            self._in_flight_messages -= 1
     
     @LINEBotErrorHandler.handle_message_error(logger)
-    async def _process_text_message(self, message_data: Dict[str, Any]):
+    async def _process_text_message(self, event: MessageEvent):
         """テキストメッセージを実際に処理"""
-        start_time = time.time()
+        start_time = time.monotonic()
         self.stats.total_messages += 1
+        user_id = event.source.user_id
         
         try:
-            event = message_data["event"]
-            user_id = message_data["user_id"]
-            message_text = message_data["message_text"]
+            message_text = event.message.text
             
             logger.info(f"📝 Processing message from {user_id}: {message_text[:50]}...")
             
             # レート制限チェック
-            if not self._check_rate_limit(user_id):
+            if not await self._check_rate_limit(user_id):
                 await self._send_rate_limit_message(event.reply_token)
                 return
             
             # メッセージを清浄化
             cleaned_message = clean_message(message_text)
             
+            # キャッシュチェック（キャッシュされるのは検証済みの非コマンドメッセージのみなので、
+            # ヒットした場合はバリデーション・コマンド解析を省略できる）
+            cached_response = await self._get_cached_response(user_id, cleaned_message)
+            if cached_response:
+                self.stats.cache_hits += 1
+                self._update_user_session(user_id, cleaned_message, cached_response)
+                await self._send_message(event.reply_token, cached_response, user_id)
+                logger.debug(f"Cache hit for user {user_id}")
+                return
+            
             # バリデーション
             if not self._validate_message(cleaned_message):
                 await self._send_validation_error(event.reply_token)
@@ -167,18 +325,13 @@ class OptimizedLineMessageHandler:
                 self.stats.commands_processed += 1
                 return
             
-            # セッション更新
-            self._update_user_session(user_id, cleaned_message)
-            
-            # キャッシュチェック
-            cached_response = self._get_cached_response(user_id, cleaned_message)
-            if cached_response:
-                await self._send_message(event.reply_token, cached_response)
-                logger.debug(f"Cache hit for user {user_id}")
-                return
-            
             # AI処理
+            agent_start = time.monotonic()
             response = await self._process_with_agent(user_id, cleaned_message)
+            agent_time = time.monotonic() - agent_start
+            
+            # セッション更新（メッセージと応答をまとめて記録）
+            self._update_user_session(user_id, cleaned_message, response)
             
             # 作業報告の場合は統計を更新
             if is_work_report(cleaned_message):
@@ -187,15 +340,16 @@ class OptimizedLineMessageHandler:
             # レスポンスをフォーマット
             formatted_response = format_agent_response(response)
             
-            # キャッシュに保存
-            self._cache_response(user_id, cleaned_message, formatted_response)
+            # キャッシュに保存（即座に返った応答＝エラー応答などはキャッシュしない）
+            if agent_time >= self.cache_min_processing_time:
+                await self._cache_response(user_id, cleaned_message, formatted_response)
             
             # レスポンスを送信
-            await self._send_message(event.reply_token, formatted_response)
+            await self._send_message(event.reply_token, formatted_response, user_id)
             
             # 統計更新
             self.stats.successful_messages += 1
-            processing_time = time.time() - start_time
+            processing_time = time.monotonic() - start_time
             self.stats.total_processing_time += processing_time
             self.stats.average_processing_time = (
                 self.stats.total_processing_time / self.stats.successful_messages
@@ -207,22 +361,40 @@ class OptimizedLineMessageHandler:
             self.stats.failed_messages += 1
             logger.error(f"❌ Error processing text message: {e}")
             
-            if hasattr(message_data, 'event'):
-                await self._send_error_message(message_data['event'].reply_token)
+            await self._send_error_message(event.reply_token, user_id)
     
-    def _check_rate_limit(self, user_id: str) -> bool:
-        """レート制限をチェック"""
-        now = datetime.now()
+    async def _check_rate_limit(self, user_id: str) -> bool:
+        """レート制限をチェック（Redis が使えない場合はプロセス内で判定）"""
+        if self.redis is not None:
+            try:
+                return await self._check_shared_rate_limit(user_id)
+            except Exception as e:
+                logger.warning(f"Redis rate limit check failed, falling back to local: {e}")
+        return self._check_local_rate_limit(user_id)
+    
+    async def _check_shared_rate_limit(self, user_id: str) -> bool:
+        """Redis のソート済みセットでスライディングウィンドウのレート制限を判定"""
+        allowed = await self._rate_limit_script(
+            keys=[f"rl:{user_id}"],
+            args=[time.time(), self.rate_limit_window, self.rate_limit_count, str(time.time_ns())]
+        )
+        
+        if not allowed:
+            logger.warning(f"Rate limit exceeded for user {user_id}")
+            return False
+        return True
+    
+    def _check_local_rate_limit(self, user_id: str) -> bool:
+        """プロセス内の履歴でレート制限を判定"""
+        now = time.monotonic()
         
         # ユーザーのリクエスト履歴を取得
-        if user_id not in self.rate_limiter:
-            self.rate_limiter[user_id] = []
-        
         user_requests = self.rate_limiter[user_id]
         
-        # 古いリクエストを削除
-        cutoff_time = now - timedelta(seconds=self.rate_limit_window)
-        user_requests[:] = [req_time for req_time in user_requests if req_time > cutoff_time]
+        # 古いリクエストを先頭から削除
+        cutoff_time = now - self.rate_limit_window
+        while user_requests and user_requests[0] <= cutoff_time:
+            user_requests.popleft()
         
         # レート制限チェック
         if len(user_requests) >= self.rate_limit_count:
@@ -248,74 +420,73 @@ class OptimizedLineMessageHandler:
         
         return True
     
-    def _get_cached_response(self, user_id: str, message: str) -> Optional[str]:
+    @staticmethod
+    def _response_cache_key(user_id: str, message: str) -> str:
+        """キャッシュキーを生成（hash() と違いプロセス間で値が変わらない）"""
+        return f"{user_id}:{xxhash.xxh3_64_hexdigest(message.encode('utf-8'))}"
+    
+    async def _get_cached_response(self, user_id: str, message: str) -> Optional[str]:
         """キャッシュされたレスポンスを取得"""
-        cache_key = f"{user_id}:{hash(message)}"
-        
-        if cache_key in self.response_cache:
-            response, timestamp = self.response_cache[cache_key]
-            
-            # TTL チェック
-            if datetime.now() - timestamp < timedelta(seconds=self.cache_ttl):
-                return response
-            else:
-                # 期限切れなので削除
-                del self.response_cache[cache_key]
-        
-        return None
+        cache_key = self._response_cache_key(user_id, message)
+        if self.redis is not None:
+            try:
+                return await self.redis.get(f"{RESPONSE_CACHE_PREFIX}{cache_key}")
+            except Exception as e:
+                logger.warning(f"Redis cache read failed, falling back to local: {e}")
+        return self.response_cache.get(cache_key)
     
-    def _cache_response(self, user_id: str, message: str, response: str):
+    async def _cache_response(self, user_id: str, message: str, response: str):
         """レスポンスをキャッシュ"""
-        cache_key = f"{user_id}:{hash(message)}"
-        self.response_cache[cache_key] = (response, datetime.now())
-        
-        # キャッシュサイズ制限（簡単な実装）
-        if len(self.response_cache) > 1000:
-            # 最も古いエントリを削除
-            oldest_key = min(self.response_cache.keys(), 
-                           key=lambda k: self.response_cache[k][1])
-            del self.response_cache[oldest_key]
+        cache_key = self._response_cache_key(user_id, message)
+        if self.redis is not None:
+            try:
+                await self.redis.setex(f"{RESPONSE_CACHE_PREFIX}{cache_key}", self.cache_ttl, response)
+                return
+            except Exception as e:
+                logger.warning(f"Redis cache write failed, falling back to local: {e}")
+        # 上限を超えると最も長く使われていないエントリが O(1) で追い出される
+        self.response_cache[cache_key] = response
     
     async def _handle_command(self, event: MessageEvent, user_id: str, command: str):
         """特殊コマンドを処理"""
         try:
             if command == "help":
-                from .utils import create_help_message
-                help_message = create_help_message()
-                await self._send_message(event.reply_token, help_message)
+                await self._send_message(event.reply_token, create_help_message(), user_id)
             
             elif command == "reset":
                 # メモリをリセット
                 self.agent_manager.clear_user_memory(user_id)
                 # セッションもリセット
                 self._cleanup_user_session(user_id)
-                await self._send_message(event.reply_token, "会話履歴をリセットしました。")
+                await self._send_message(event.reply_token, RESET_MESSAGE)
             
             elif command == "status":
                 # ユーザー統計を表示
-                session = self.user_sessions.get(user_id, {})
-                status_info = f"""📊 ユーザー状況:
-メッセージ数: {session.get('message_count', 0)}
-最終活動: {session.get('last_activity', 'N/A')}
-セッション開始: {session.get('first_interaction', 'N/A')}"""
+                session = self.user_sessions.get(user_id)
+                if session:
+                    status_info = STATUS_TEMPLATE.format(
+                        message_count=session.message_count,
+                        last_activity=_to_datetime(session.last_activity),
+                        first_interaction=_to_datetime(session.first_interaction)
+                    )
+                else:
+                    status_info = STATUS_EMPTY_MESSAGE
                 await self._send_message(event.reply_token, status_info)
             
             else:
-                await self._send_message(event.reply_token, "不明なコマンドです。")
+                await self._send_message(event.reply_token, UNKNOWN_COMMAND_MESSAGE)
                 
         except Exception as e:
             logger.error(f"Error handling command {command}: {e}")
-            await self._send_error_message(event.reply_token)
+            await self._send_error_message(event.reply_token, user_id)
     
     async def _send_rate_limit_message(self, reply_token: str):
         """レート制限メッセージを送信"""
-        message = "メッセージの送信が多すぎます。しばらく待ってから再度お試しください。"
-        await self._send_message(reply_token, message)
+        await _call_line_api(self.line_bot_api, "reply_message", reply_token, RATE_LIMIT_REPLY)
     
     async def _send_validation_error(self, reply_token: str):
         """バリデーションエラーメッセージを送信"""
-        message = "メッセージの形式が正しくありません。もう一度お試しください。"
-        await self._send_message(reply_token, message)
+        await _call_line_api(self.line_bot_api, "reply_message", reply_token, VALIDATION_ERROR_REPLY)
     
     async def handle_follow_event(self, event: FollowEvent):
         """Handle follow events (user adds bot as friend)."""
@@ -323,11 +494,7 @@ class OptimizedLineMessageHandler:
             user_id = event.source.user_id
             
             # Get user profile
-            try:
-                profile = self.line_bot_api.get_profile(user_id)
-                user_name = profile.display_name
-            except LineBotApiError:
-                user_name = "ユーザー"
+            user_name = await self._get_display_name(user_id)
             
             logger.info(f"👤 New follow from {user_id} ({user_name})")
             
@@ -340,7 +507,19 @@ class OptimizedLineMessageHandler:
             
         except Exception as e:
             logger.error(f"❌ Error handling follow event: {e}")
-            await self._send_error_message(event.reply_token)
+            await self._send_error_message(event.reply_token, event.source.user_id)
+    
+    async def _get_display_name(self, user_id: str) -> str:
+        """LINE プロフィールの表示名を取得（1時間キャッシュ）"""
+        user_name = self.profile_cache.get(user_id)
+        if user_name is None:
+            try:
+                profile = await _call_line_api(self.line_bot_api, "get_profile", user_id)
+            except LineBotApiError:
+                # 取得失敗はキャッシュせず、次回のフォローで再取得する
+                return "ユーザー"
+            user_name = self.profile_cache[user_id] = profile.display_name
+        return user_name
     
     async def handle_unfollow_event(self, event: UnfollowEvent):
         """Handle unfollow events (user removes bot)."""
@@ -361,25 +540,13 @@ class OptimizedLineMessageHandler:
     async def handle_join_event(self, event: JoinEvent):
         """Handle join events (bot added to group)."""
         try:
-            group_id = event.source.group_id if hasattr(event.source, 'group_id') else None
-            room_id = event.source.room_id if hasattr(event.source, 'room_id') else None
+            group_id = getattr(event.source, 'group_id', None)
+            room_id = getattr(event.source, 'room_id', None)
             
             logger.info(f"🏢 Bot joined group/room: {group_id or room_id}")
             
             # Send group welcome message
-            welcome_message = """こんにちは！農業AIアシスタントです🌾
-
-グループでご利用いただきありがとうございます。
-
-主な機能：
-• 今日の作業確認
-• 作業報告の記録
-• 圃場情報の確認
-• 農薬・資材の推奨
-
-何かご質問がありましたら、お気軽にお声がけください！"""
-            
-            await self._send_message(event.reply_token, welcome_message)
+            await self._send_message(event.reply_token, GROUP_WELCOME_MESSAGE)
             
         except Exception as e:
             logger.error(f"❌ Error handling join event: {e}")
@@ -388,8 +555,8 @@ class OptimizedLineMessageHandler:
     async def handle_leave_event(self, event: LeaveEvent):
         """Handle leave events (bot removed from group)."""
         try:
-            group_id = event.source.group_id if hasattr(event.source, 'group_id') else None
-            room_id = event.source.room_id if hasattr(event.source, 'room_id') else None
+            group_id = getattr(event.source, 'group_id', None)
+            room_id = getattr(event.source, 'room_id', None)
             
             logger.info(f"👋 Bot left group/room: {group_id or room_id}")
             
@@ -403,104 +570,134 @@ class OptimizedLineMessageHandler:
         """Process message with AI agent."""
         try:
             # Get response from agent
-            response = await self.agent_manager.process_user_message(user_id, message)
-            
-            # Update user session with response
-            self._update_user_session(user_id, None, response)
-            
-            return response
+            return await self.agent_manager.process_user_message(user_id, message)
             
         except Exception as e:
             logger.error(f"❌ Error processing with agent: {e}")
             return "申し訳ございません。処理中にエラーが発生しました。しばらくしてからもう一度お試しください。"
     
-    async def _send_message(self, reply_token: str, message: str):
-        """Send message to LINE."""
+    async def _send_message(self, reply_token: str, message: str, user_id: Optional[str] = None):
+        """Send message to LINE.
+
+        分割したメッセージは1回の reply_message でまとめて送り、
+        上限を超えた分は user_id 宛てに push_message で5件ずつ送る。
+        """
         try:
             # Split long messages if needed
-            messages = self._split_long_message(message)
+            payload = [TextSendMessage(text=msg) for msg in self._split_long_message(message)]
+            
+            # reply_token は1回しか使えないため、先頭の5件をまとめて送信
+            await _call_line_api(
+                self.line_bot_api, "reply_message", reply_token, payload[:REPLY_MAX_MESSAGES]
+            )
+            
+            if len(payload) > REPLY_MAX_MESSAGES:
+                if not user_id:
+                    logger.warning(f"Reply truncated to {REPLY_MAX_MESSAGES} of {len(payload)} messages")
+                    return
+                for i in range(REPLY_MAX_MESSAGES, len(payload), REPLY_MAX_MESSAGES):
+                    await _call_line_api(
+                        self.line_bot_api, "push_message", user_id, payload[i:i + REPLY_MAX_MESSAGES]
+                    )
             
-            # Send messages
-            for msg in messages:
-                self.line_bot_api.reply_message(
-                    reply_token,
-                    TextSendMessage(text=msg)
-                )
-                
-                # Small delay between messages
-                if len(messages) > 1:
-                    await asyncio.sleep(0.5)
-                    
         except LineBotApiError as e:
             logger.error(f"❌ LINE API error: {e}")
             raise
     
-    async def _send_error_message(self, reply_token: str):
-        """Send error message to LINE."""
+    async def _send_error_message(self, reply_token: str, user_id: Optional[str] = None):
+        """Send error message to LINE.
+
+        reply_token が使用済み・期限切れの場合は、宛先をまとめて multicast で送る。
+        """
         try:
-            error_message = create_error_message()
-            await self._send_message(reply_token, error_message)
+            await _call_line_api(self.line_bot_api, "reply_message", reply_token, ERROR_REPLY)
+        except LineBotApiError as e:
+            # レート制限・サーバーエラーなどは multicast に回さない（push 通数を消費しないため）
+            if user_id and _is_invalid_reply_token(e):
+                self.error_batcher.add(user_id)
+            else:
+                logger.error(f"❌ Failed to send error message: {e}")
         except Exception as e:
             logger.error(f"❌ Failed to send error message: {e}")
     
     def _split_long_message(self, message: str, max_length: int = 2000) -> list:
-        """Split long messages into chunks."""
-        if len(message) <= max_length:
+        """Split long messages into chunks.
+
+        LINE の文字数制限は UTF-16 単位のため、絵文字などのサロゲートペアは2文字として数える。
+        """
+        if _utf16_len(message) <= max_length:
             return [message]
         
         chunks = []
-        current_chunk = ""
+        current: List[str] = []
+        current_len = 0
         
         for line in message.split('\n'):
-            if len(current_chunk) + len(line) + 1 <= max_length:
-                current_chunk += line + '\n'
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.rstrip())
-                current_chunk = line + '\n'
-        
-        if current_chunk:
-            chunks.append(current_chunk.rstrip())
+            line_len = _utf16_len(line) + 1  # 改行分
+            if current and current_len + line_len > max_length:
+                chunk = '\n'.join(current).rstrip()
+                if chunk:
+                    chunks.append(chunk)
+                current, current_len = [], 0
+            
+            # 1行だけで上限を超える場合は行の途中で分割
+            while line_len - 1 > max_length:
+                head, line = _split_utf16(line, max_length)
+                chunks.append(head)
+                line_len = _utf16_len(line) + 1
+            
+            current.append(line)
+            current_len += line_len
+        
+        chunk = '\n'.join(current).rstrip()
+        if chunk:
+            chunks.append(chunk)
         
         return chunks
     
     def _initialize_user_session(self, user_id: str, user_name: str):
         """Initialize user session."""
-        self.user_sessions[user_id] = {
-            "user_name": user_name,
-            "first_interaction": datetime.now(),
-            "last_activity": datetime.now(),
-            "message_count": 0
-        }
+        self.user_sessions[user_id] = self._acquire_session(user_name, time.time())
     
     def _update_user_session(self, user_id: str, message: Optional[str] = None, response: Optional[str] = None):
         """Update user session."""
-        if user_id not in self.user_sessions:
-            self.user_sessions[user_id] = {
-                "user_name": "ユーザー",
-                "first_interaction": datetime.now(),
-                "last_activity": datetime.now(),
-                "message_count": 0
-            }
+        now = time.time()
+        session = self.user_sessions.get(user_id)
+        if session is None:
+            session = self.user_sessions[user_id] = self._acquire_session("ユーザー", now)
         
-        session = self.user_sessions[user_id]
-        session["last_activity"] = datetime.now()
+        session.last_activity = now
         
         if message:
-            session["message_count"] += 1
-            session["last_message"] = message
+            session.message_count += 1
+            session.last_message = message
         
         if response:
-            session["last_response"] = response
+            session.last_response = response
+    
+    def _acquire_session(self, user_name: str, now: float) -> UserSession:
+        """プールから再利用するか、新しいセッションを作成"""
+        if self._session_pool:
+            session = self._session_pool.pop()
+            session.__init__(user_name, now, now)
+            return session
+        return UserSession(user_name, now, now)
     
     def _cleanup_user_session(self, user_id: str):
         """Clean up user session."""
-        if user_id in self.user_sessions:
-            del self.user_sessions[user_id]
+        session = self.user_sessions.pop(user_id, None)
+        if session is not None and len(self._session_pool) < SESSION_POOL_SIZE:
+            # 前の会話内容を保持しないようリセットしてからプールに戻す
+            session.__init__("", 0.0, 0.0)
+            self._session_pool.append(session)
+    
+    def get_user_sessions(self) -> Mapping[str, UserSession]:
+        """Get all user sessions (read-only live view; reflects later updates)."""
+        return MappingProxyType(self.user_sessions)
     
-    def get_user_sessions(self) -> Dict[str, Dict[str, Any]]:
-        """Get all user sessions."""
-        return self.user_sessions.copy()
+    def snapshot_user_sessions(self) -> Dict[str, Dict[str, Any]]:
+        """Get a copy of all user sessions as plain dicts."""
+        return {user_id: asdict(session) for user_id, session in self.user_sessions.items()}
     
     def get_active_users_count(self) -> int:
         """Get count of active users."""
@@ -520,52 +717,82 @@ class OptimizedLineMessageHandler:
             "total_processing_time": self.stats.total_processing_time,
             "work_reports_processed": self.stats.work_reports_processed,
             "commands_processed": self.stats.commands_processed,
+            "cache_hits": self.stats.cache_hits,
             "cache_size": len(self.response_cache),
-            "queue_size": self.message_queue.qsize(),
+            "in_flight_messages": self._in_flight_messages,
             "active_users": len(self.user_sessions)
         }
     
     def get_user_stats(self, user_id: str) -> Optional[Dict[str, Any]]:
         """ユーザー統計を取得"""
-        if user_id not in self.user_sessions:
+        session = self.user_sessions.get(user_id)
+        if session is None:
             return None
         
-        session = self.user_sessions[user_id]
         return {
             "user_id": user_id,
-            "user_name": session.get("user_name", "不明"),
-            "first_interaction": session.get("first_interaction"),
-            "last_activity": session.get("last_activity"),
-            "message_count": session.get("message_count", 0),
-            "last_message": session.get("last_message", ""),
-            "last_response": session.get("last_response", "")
+            "user_name": session.user_name,
+            "first_interaction": _to_datetime(session.first_interaction),
+            "last_activity": _to_datetime(session.last_activity),
+            "message_count": session.message_count,
+            "last_message": session.last_message,
+            "last_response": session.last_response
         }
     
-    def clear_cache(self):
-        """キャッシュをクリア"""
+    async def clear_cache(self):
+        """キャッシュをクリア（Redis 使用時は共有キャッシュのキーも削除）"""
         self.response_cache.clear()
+        
+        if self.redis is not None:
+            removed = 0
+            batch: List[str] = []
+            async for key in self.redis.scan_iter(match=f"{RESPONSE_CACHE_PREFIX}*", count=CACHE_CLEAR_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= CACHE_CLEAR_BATCH_SIZE:
+                    removed += await self.redis.unlink(*batch)
+                    batch.clear()
+            if batch:
+                removed += await self.redis.unlink(*batch)
+            logger.info(f"Removed {removed} shared response cache entries")
+        
         logger.info("Response cache cleared")
     
-    def cleanup_expired_cache(self):
-        """期限切れキャッシュをクリーンアップ"""
-        now = datetime.now()
-        expired_keys = []
+    async def _periodic_sweep(self):
+        """定期的に期限切れデータを削除"""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Error during periodic sweep: {e}")
+    
+    def sweep(self):
+        """期限切れキャッシュ・休眠セッション・空のレート制限履歴を削除"""
+        self.cleanup_expired_cache()
+        
+        session_cutoff = time.time() - self.session_ttl
+        dormant = [uid for uid, session in self.user_sessions.items() if session.last_activity < session_cutoff]
+        for user_id in dormant:
+            self._cleanup_user_session(user_id)
         
-        for key, (response, timestamp) in self.response_cache.items():
-            if now - timestamp > timedelta(seconds=self.cache_ttl):
-                expired_keys.append(key)
+        # レート制限履歴は time.monotonic() で記録している
+        rate_cutoff = time.monotonic() - self.rate_limit_window
+        for user_id, user_requests in list(self.rate_limiter.items()):
+            while user_requests and user_requests[0] <= rate_cutoff:
+                user_requests.popleft()
+            if not user_requests:
+                del self.rate_limiter[user_id]
         
-        for key in expired_keys:
-            del self.response_cache[key]
+        if dormant:
+            logger.info(f"Removed {len(dormant)} dormant user sessions")
+    
+    def cleanup_expired_cache(self):
+        """期限切れキャッシュをクリーンアップ"""
+        expired = self.response_cache.expire()
         
-        if expired_keys:
-            logger.info(f"Cleaned up {len(expired_keys)} expired cache entries")
+        if expired:
+            logger.info(f"Cleaned up {len(expired)} expired cache entries")
 
 
-# 後方互換性のために元のクラスも保持
-class LineMessageHandler(OptimizedLineMessageHandler):
-    """LINE Bot メッセージハンドラー（後方互換性）"""
-    
-    def __init__(self, agent_manager: AgentManager, line_bot_api: LineBotApi):
-        super().__init__(agent_manager, line_bot_api)
-        logger.info("Using legacy LineMessageHandler")
\ No newline at end of file
+# 後方互換性のための別名
+LineMessageHandler = OptimizedLineMessageHandler
\ No newline at end of file
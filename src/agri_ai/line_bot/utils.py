@@ -4,41 +4,97 @@ Utility functions for LINE Bot.
 
 import re
 import logging
+from functools import lru_cache
 from typing import Optional
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Patterns compiled once at import time
+_MULTI_NL = re.compile(r'\n\s*\n')
+_FIELD_PATTERNS = tuple(re.compile(p) for p in (
+    r'[Ff]\d+',
+    r'鵡川.*?家裏',
+    r'橋向こう.*?③',
+    r'石谷.*?横',
+    r'大豆.*?圃場',
+    r'トマト.*?圃場'
+))
+# All field patterns in one alternation; group name f<i> is the pattern's priority
+_FIELD_RE = re.compile('|'.join(f'(?P<f{i}>{p.pattern})' for i, p in enumerate(_FIELD_PATTERNS)))
+_FIELD_PRIORITY = {f'f{i}': i for i in range(len(_FIELD_PATTERNS))}
+_NONCHAR = re.compile(r'[^\w\s\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF\u3400-\u4DBF]')
+# Same filter as _NONCHAR for ASCII-only input, applied via str.translate
+_ASCII_NONCHAR_TABLE = {i: None for i in range(128) if _NONCHAR.match(chr(i))}
+
+# Task types and their keywords, in priority order
+_TASK_KEYWORDS = (
+    ('防除', ('防除', '散布', '農薬', 'スプレー')),
+    ('播種', ('播種', '種まき', '種蒔き', '植え付け')),
+    ('収穫', ('収穫', '刈り取り', '採取')),
+    ('耕起', ('耕起', '耕す', '田起こし')),
+    ('施肥', ('施肥', '肥料', '追肥')),
+    ('除草', ('除草', '草刈り', '草取り')),
+    ('灌水', ('灌水', '水やり', '散水')),
+    ('管理', ('管理', '見回り', '点検'))
+)
+_TASK_PATTERNS = tuple(re.compile('|'.join(map(re.escape, keywords))) for _, keywords in _TASK_KEYWORDS)
+# All task keywords in one alternation; group name t<i> is the task type's priority
+_TASK_RE = re.compile('|'.join(f'(?P<t{i}>{p.pattern})' for i, p in enumerate(_TASK_PATTERNS)))
+_TASK_PRIORITY = {f't{i}': i for i in range(len(_TASK_PATTERNS))}
+
+# Special commands (help / reset / status), keyed by normalized message
+_COMMANDS = {
+    word: command
+    for command, words in (
+        ('help', ('ヘルプ', 'help', '使い方', '説明')),
+        ('reset', ('リセット', 'reset', '初期化', 'クリア')),
+        ('status', ('ステータス', 'status', '状態')),
+    )
+    for word in words
+}
+
+# Work report indicators
+_REPORT_RE = re.compile('|'.join(map(re.escape, (
+    '完了', '終了', '実施', 'やった', '行った',
+    '散布', '収穫', '播種', '防除', '施肥', '除草',
+    '終わり', '終わった', '済み', '済んだ'
+))))
+
+# Single-character markdown conversions (applied after '**' is removed)
+_MARKDOWN_TABLE = str.maketrans({'*': '•'})
+
+# Response length limit for LINE display
+_MAX_RESPONSE_LENGTH = 2000
+_TRUNC_AT = 1950
+_TRUNC_SUFFIX = "...\n\n（応答が長すぎるため省略されました）"
+
 
 def format_agent_response(response: str) -> str:
     """Format AI agent response for LINE display."""
     try:
-        # Remove excessive whitespace
-        response = re.sub(r'\n\s*\n', '\n\n', response)
-        
-        # Convert markdown-style formatting to LINE-friendly format
-        response = response.replace('**', '')
-        response = response.replace('*', '•')
-        
-        # Add emoji to section headers
-        response = response.replace('📋 作業報告', '📋 作業報告')
-        response = response.replace('❌ エラー', '❌ エラー')
-        response = response.replace('⚠️ 注意', '⚠️ 注意')
-        response = response.replace('💡 提案', '💡 提案')
-        response = response.replace('🔮 次回作業提案', '🔮 次回作業提案')
-        response = response.replace('📊 解析信頼度', '📊 解析信頼度')
-        
-        # Limit response length
-        if len(response) > 2000:
-            response = response[:1950] + "...\n\n（応答が長すぎるため省略されました）"
-        
-        return response
-        
+        return _format_response_text(response)
     except Exception as e:
         logger.error(f"Error formatting response: {e}")
         return response
 
 
+@lru_cache(maxsize=512)
+def _format_response_text(response: str) -> str:
+    """Format response text (memoized; same input always gives the same output)."""
+    # Remove excessive whitespace
+    response = _MULTI_NL.sub('\n\n', response)
+    
+    # Convert markdown-style formatting to LINE-friendly format
+    response = response.replace('**', '').translate(_MARKDOWN_TABLE)
+    
+    # Limit response length
+    if len(response) > _MAX_RESPONSE_LENGTH:
+        response = response[:_TRUNC_AT] + _TRUNC_SUFFIX
+    
+    return response
+
+
 def create_welcome_message(user_name: str) -> str:
     """Create welcome message for new users."""
     return f"""こんにちは、{user_name}さん！🌾
@@ -60,6 +116,7 @@ def create_welcome_message(user_name: str) -> str:
 何かご質問がありましたら、お気軽にお声がけください！"""
 
 
+@lru_cache(maxsize=1)
 def create_error_message() -> str:
     """Create error message."""
     return """申し訳ございません。
@@ -70,6 +127,7 @@ def create_error_message() -> str:
 問題が続く場合は、管理者にお問い合わせください。"""
 
 
+@lru_cache(maxsize=1)
 def create_help_message() -> str:
     """Create help message."""
     return """🌾 農業AIアシスタント - ヘルプ
@@ -103,65 +161,46 @@ def create_help_message() -> str:
 
 def parse_command(message: str) -> Optional[str]:
     """Parse special commands from message."""
-    message = message.strip().lower()
-    
-    # Help commands
-    if message in ['ヘルプ', 'help', '使い方', '説明']:
-        return 'help'
-    
-    # Reset commands
-    if message in ['リセット', 'reset', '初期化', 'クリア']:
-        return 'reset'
-    
-    # Status commands
-    if message in ['ステータス', 'status', '状態']:
-        return 'status'
-    
-    return None
+    return _COMMANDS.get(message.strip().lower())
 
 
+@lru_cache(maxsize=2048)
 def extract_field_name(message: str) -> Optional[str]:
     """Extract field name from message."""
-    # Look for field patterns like F14, F1, etc.
-    field_match = re.search(r'[Ff](\d+)', message)
-    if field_match:
-        return f"F{field_match.group(1)}"
-    
-    # Look for other field patterns
-    field_patterns = [
-        r'鵡川.*?家裏',
-        r'橋向こう.*?③',
-        r'石谷.*?横',
-        r'大豆.*?圃場',
-        r'トマト.*?圃場'
-    ]
+    # Single scan for the leftmost match of any field pattern (F14, 鵡川家裏, ...)
+    match = _FIELD_RE.search(message)
+    if match is None:
+        return None
     
-    for pattern in field_patterns:
-        match = re.search(pattern, message)
-        if match:
-            return match.group(0)
+    # Keep pattern priority: a higher-priority pattern can only match further right
+    priority = _FIELD_PRIORITY[match.lastgroup]
+    for higher_priority, pattern in enumerate(_FIELD_PATTERNS[:priority]):
+        higher = pattern.search(message, match.start() + 1)
+        if higher:
+            match, priority = higher, higher_priority
+            break
     
-    return None
+    field_name = match.group(0)
+    if priority == 0:
+        # Normalize field codes like f14 to F14
+        return f"F{field_name[1:]}"
+    return field_name
 
 
+@lru_cache(maxsize=2048)
 def extract_task_type(message: str) -> Optional[str]:
     """Extract task type from message."""
-    task_keywords = {
-        '防除': ['防除', '散布', '農薬', 'スプレー'],
-        '播種': ['播種', '種まき', '種蒔き', '植え付け'],
-        '収穫': ['収穫', '刈り取り', '採取'],
-        '耕起': ['耕起', '耕す', '田起こし'],
-        '施肥': ['施肥', '肥料', '追肥'],
-        '除草': ['除草', '草刈り', '草取り'],
-        '灌水': ['灌水', '水やり', '散水'],
-        '管理': ['管理', '見回り', '点検']
-    }
+    # Single scan for the leftmost keyword of any task type
+    match = _TASK_RE.search(message)
+    if match is None:
+        return None
     
-    for task_type, keywords in task_keywords.items():
-        if any(keyword in message for keyword in keywords):
-            return task_type
-    
-    return None
+    # Keep task-type priority: a higher-priority keyword can only occur further right
+    priority = _TASK_PRIORITY[match.lastgroup]
+    for higher_priority, pattern in enumerate(_TASK_PATTERNS[:priority]):
+        if pattern.search(message, match.start() + 1):
+            return _TASK_KEYWORDS[higher_priority][0]
+    return _TASK_KEYWORDS[priority][0]
 
 
 def format_time_ago(timestamp: datetime) -> str:
@@ -181,23 +220,18 @@ def format_time_ago(timestamp: datetime) -> str:
         return "たった今"
 
 
+@lru_cache(maxsize=2048)
 def is_work_report(message: str) -> bool:
     """Check if message is a work report."""
-    report_indicators = [
-        '完了', '終了', '実施', 'やった', '行った', 
-        '散布', '収穫', '播種', '防除', '施肥', '除草',
-        '終わり', '終わった', '済み', '済んだ'
-    ]
-    
-    return any(indicator in message for indicator in report_indicators)
+    return _REPORT_RE.search(message) is not None
 
 
 def clean_message(message: str) -> str:
     """Clean and normalize message."""
     # Remove extra whitespace
-    message = re.sub(r'\s+', ' ', message).strip()
+    message = ' '.join(message.split())
     
     # Remove special characters that might cause issues
-    message = re.sub(r'[^\w\s\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF\u3400-\u4DBF]', '', message)
-    
-    return message
\ No newline at end of file
+    if message.isascii():
+        return message.translate(_ASCII_NONCHAR_TABLE)
+    return _NONCHAR.sub('', message)
\ No newline at end of file
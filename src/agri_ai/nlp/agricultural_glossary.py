@@ -3,12 +3,124 @@
 """
 
 import re
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 抽出用パターン（モジュール読み込み時に一度だけコンパイル）
+_FIELD_NAME_PATTERNS = tuple(re.compile(p) for p in (
+    r"([^\s]+(?:圃場|畑|ハウス|温室))",
+    r"([A-Z]\d+)",  # F14, A1 などの形式
+    r"([^\s]+(?:家裏|家前|横|北|南|東|西))",  # 石谷さん横 などの形式
+    r"(鵡川[^\s]*)",  # 鵡川関連
+    r"(豊糠[^\s]*)"   # 豊糠関連
+))
+# 全パターンを1つにまとめた正規表現（グループ名 f0, f1, ... が優先順位を表す）
+_FIELD_NAME_RE = re.compile("|".join(f"(?P<f{i}>{p.pattern})" for i, p in enumerate(_FIELD_NAME_PATTERNS)))
+_FIELD_NAME_PRIORITY = {f"f{i}": i for i in range(len(_FIELD_NAME_PATTERNS))}
+
+# 数量パターン: (カテゴリ, 数値, 単位)。全カテゴリを1つの正規表現にまとめ、カテゴリ名のグループで判別する
+_QUANTITY_CATEGORIES = (
+    ("area", r"\d+(?:\.\d+)?", r"ha|ヘクタール|a|アール|㎡|平方メートル|平米"),
+    ("volume", r"\d+(?:\.\d+)?", r"L|リットル|ml|mL|ミリリットル|cc"),
+    ("weight", r"\d+(?:\.\d+)?", r"kg|キログラム|キロ|g|グラム|t|トン"),
+    ("dilution", r"\d+", r"倍|倍希釈"),
+)
+_QUANTITY_RE = re.compile(
+    "|".join(
+        rf"(?P<{name}>(?P<{name}_value>{number})\s*(?P<{name}_unit>{units}))"
+        for name, number, units in _QUANTITY_CATEGORIES
+    ),
+    re.IGNORECASE
+)
+# カテゴリ名 → (出力順, 数値グループ名, 単位グループ名)
+_QUANTITY_GROUPS = {
+    name: (order, f"{name}_value", f"{name}_unit")
+    for order, (name, _, _) in enumerate(_QUANTITY_CATEGORIES)
+}
+# 単位表記（小文字）→ 正規化後の単位（希釈倍率は正規化しない）
+_CANONICAL_UNITS = {
+    "ha": "ha", "ヘクタール": "ha", "a": "a", "アール": "a",
+    "㎡": "㎡", "平方メートル": "㎡", "平米": "㎡",
+    "l": "L", "リットル": "L", "ml": "ml", "ミリリットル": "ml", "cc": "cc",
+    "kg": "kg", "キログラム": "kg", "キロ": "kg", "g": "g", "グラム": "g", "t": "t", "トン": "t",
+}
+
+
+_TOKEN_RE = re.compile(r"\S+")
+
+# メモ化する正規化・抽出メソッドとキャッシュサイズ
+NORMALIZE_CACHE_SIZE = 4096
+_MEMOIZED_METHODS = (
+    "normalize_crop_name",
+    "normalize_task_name",
+    "normalize_material_name",
+    "normalize_status",
+    "normalize_units",
+    "normalize_time",
+    "normalize_dilution",
+    "extract_field_name",
+)
+
+
+class KeywordMatcher:
+    """複数のキーワードを1つの正規表現で検索する（リスト順の優先度を保つ）"""
+    
+    __slots__ = ("keywords", "_index", "_regex")
+    
+    def __init__(self, keywords: List[str]):
+        self.keywords = tuple(keywords)
+        self._index: Dict[str, int] = {}
+        for i, keyword in enumerate(self.keywords):
+            self._index.setdefault(keyword, i)
+        self._regex = re.compile("|".join(map(re.escape, self.keywords)))
+    
+    def contains(self, text: str) -> bool:
+        """いずれかのキーワードを含むか"""
+        return self._regex.search(text) is not None
+    
+    def search(self, text: str) -> Optional[int]:
+        """テキストに含まれるキーワードのうち、最も優先度の高いもののインデックスを返す"""
+        match = self._regex.search(text)
+        if match is None:
+            return None
+        
+        # 最も左の一致より優先度の高いキーワードは、一致位置より後ろにしか現れ得ない
+        index = self._index[match.group(0)]
+        start = match.start() + 1
+        for i in range(index):
+            if text.find(self.keywords[i], start) != -1:
+                return i
+        return index
+
+
+def _synonym_matcher(synonyms: Dict[str, List[str]]) -> Tuple[KeywordMatcher, Tuple[str, ...]]:
+    """同義語辞書から (全同義語のマッチャー, 各同義語の正規名) を作る（辞書の定義順を優先度とする）"""
+    pairs = [(synonym, standard) for standard, words in synonyms.items() for synonym in words]
+    return KeywordMatcher([synonym for synonym, _ in pairs]), tuple(standard for _, standard in pairs)
+
+
+def _build_substring_index(tables: Tuple[Dict[str, List[str]], ...]) -> Dict[str, FrozenSet[str]]:
+    """正規名・同義語（小文字化）の全部分文字列から正規名の集合を引ける索引を作る"""
+    index: Dict[str, Set[str]] = {}
+    for table in tables:
+        for standard, synonyms in table.items():
+            index.setdefault("", set()).add(standard)
+            for term in {standard.lower(), *(syn.lower() for syn in synonyms)}:
+                for start in range(len(term)):
+                    for end in range(start + 1, len(term) + 1):
+                        index.setdefault(term[start:end], set()).add(standard)
+    return {key: frozenset(values) for key, values in index.items()}
+
+
+@lru_cache(maxsize=None)
+def _compile_replacements(patterns: Tuple[Tuple[str, str], ...]) -> Tuple[Tuple[re.Pattern, str], ...]:
+    """(パターン, 置換) の組をIGNORECASE付きでコンパイルする（同じ表はインスタンス間で共有）"""
+    return tuple((re.compile(pattern, re.IGNORECASE), replacement) for pattern, replacement in patterns)
+
 
 class AgriculturalGlossary:
     """農業専門用語の辞書と正規化を行うクラス"""
@@ -95,58 +207,61 @@ class AgriculturalGlossary:
             (r"(\d+)\s*(?:倍希釈|倍に希釈)", r"\1倍"),
             (r"(\d+)\s*(?:分の1|/1)", r"\1倍")
         ]
+        
+        # 同義語→正規名の検索表
+        self._crop_lookup = _synonym_matcher(self.crop_synonyms)
+        self._task_lookup = _synonym_matcher(self.task_synonyms)
+        self._material_lookup = _synonym_matcher(self.material_synonyms)
+        self._status_lookup = _synonym_matcher(self.status_synonyms)
+        
+        # 候補検索用の部分文字列索引: 小文字化した正規名・同義語の全部分文字列 → 正規名の集合
+        self._suggestion_index = _build_substring_index(
+            (self.crop_synonyms, self.task_synonyms, self.material_synonyms)
+        )
+        
+        # コンパイル済みパターン
+        self._compiled_units = _compile_replacements(
+            tuple(pair for patterns in self.unit_patterns.values() for pair in patterns)
+        )
+        self._compiled_time = _compile_replacements(tuple(self.time_patterns))
+        self._compiled_dilution = _compile_replacements(tuple(self.dilution_patterns))
+        self._compiled_all = self._compiled_units + self._compiled_time + self._compiled_dilution
+        
+        # 純粋な正規化・抽出メソッドをインスタンス単位でメモ化
+        for name in _MEMOIZED_METHODS:
+            setattr(self, name, lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(getattr(self, name)))
     
     def normalize_crop_name(self, text: str) -> str:
         """作物名を正規化する"""
-        text = text.strip()
-        
-        for standard_name, synonyms in self.crop_synonyms.items():
-            for synonym in synonyms:
-                if synonym in text.lower():
-                    return standard_name
-        
-        return text
+        return self._lookup_synonym(text.strip(), self._crop_lookup)
     
     def normalize_task_name(self, text: str) -> str:
         """作業名を正規化する"""
-        text = text.strip()
-        
-        for standard_name, synonyms in self.task_synonyms.items():
-            for synonym in synonyms:
-                if synonym in text.lower():
-                    return standard_name
-        
-        return text
+        return self._lookup_synonym(text.strip(), self._task_lookup)
     
     def normalize_material_name(self, text: str) -> str:
         """資材名を正規化する"""
-        text = text.strip()
-        
-        for standard_name, synonyms in self.material_synonyms.items():
-            for synonym in synonyms:
-                if synonym in text.lower():
-                    return standard_name
-        
-        return text
+        return self._lookup_synonym(text.strip(), self._material_lookup)
     
     def normalize_status(self, text: str) -> str:
         """ステータスを正規化する"""
-        text = text.strip()
-        
-        for standard_status, synonyms in self.status_synonyms.items():
-            for synonym in synonyms:
-                if synonym in text.lower():
-                    return standard_status
-        
-        return text
+        return self._lookup_synonym(text.strip(), self._status_lookup)
+    
+    @staticmethod
+    def _lookup_synonym(text: str, lookup: Tuple[KeywordMatcher, Tuple[str, ...]]) -> str:
+        """最初に一致した同義語の正規名を返す（一致しなければそのまま）"""
+        matcher, standards = lookup
+        index = matcher.search(text.lower())
+        if index is None:
+            return text
+        return standards[index]
     
     def normalize_units(self, text: str) -> str:
         """単位を正規化する"""
         normalized_text = text
         
-        for category, patterns in self.unit_patterns.items():
-            for pattern, replacement in patterns:
-                normalized_text = re.sub(pattern, replacement, normalized_text, flags=re.IGNORECASE)
+        for pattern, replacement in self._compiled_units:
+            normalized_text = pattern.sub(replacement, normalized_text)
         
         return normalized_text
     
@@ -154,8 +269,8 @@ class AgriculturalGlossary:
         """時間表記を正規化する"""
         normalized_text = text
         
-        for pattern, replacement in self.time_patterns:
-            normalized_text = re.sub(pattern, replacement, normalized_text, flags=re.IGNORECASE)
+        for pattern, replacement in self._compiled_time:
+            normalized_text = pattern.sub(replacement, normalized_text)
         
         return normalized_text
     
@@ -163,96 +278,70 @@ class AgriculturalGlossary:
         """希釈倍率を正規化する"""
         normalized_text = text
         
-        for pattern, replacement in self.dilution_patterns:
-            normalized_text = re.sub(pattern, replacement, normalized_text, flags=re.IGNORECASE)
+        for pattern, replacement in self._compiled_dilution:
+            normalized_text = pattern.sub(replacement, normalized_text)
         
         return normalized_text
     
     def extract_field_name(self, text: str) -> Optional[str]:
         """テキストから圃場名を抽出する"""
-        # 既知の圃場名パターンを検索
-        field_patterns = [
-            r"([^\s]+(?:圃場|畑|ハウス|温室))",
-            r"([A-Z]\d+)",  # F14, A1 などの形式
-            r"([^\s]+(?:家裏|家前|横|北|南|東|西))",  # 石谷さん横 などの形式
-            r"(鵡川[^\s]*)",  # 鵡川関連
-            r"(豊糠[^\s]*)"   # 豊糠関連
-        ]
-        
-        for pattern in field_patterns:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(1).strip()
-        
-        return None
+        # 既知の圃場名パターンを1回の走査で検索（最も左の一致）
+        match = _FIELD_NAME_RE.search(text)
+        if match is None:
+            return None
+        
+        # パターンの優先順位を保つため、より優先度の高いパターンは一致位置より後ろだけを再確認
+        priority = _FIELD_NAME_PRIORITY[match.lastgroup]
+        for pattern in _FIELD_NAME_PATTERNS[:priority]:
+            higher = pattern.search(text, match.start() + 1)
+            if higher:
+                return higher.group(1).strip()
+        
+        return match.group(match.lastgroup).strip()
     
     def extract_quantities(self, text: str) -> List[Dict[str, str]]:
         """テキストから数量情報を抽出する"""
-        quantities = []
-        
-        # 数量パターンを検索
-        quantity_patterns = [
-            r"(\d+(?:\.\d+)?)\s*(ha|ヘクタール|a|アール|㎡|平方メートル|平米)",
-            r"(\d+(?:\.\d+)?)\s*(L|リットル|ml|mL|ミリリットル|cc)",
-            r"(\d+(?:\.\d+)?)\s*(kg|キログラム|キロ|g|グラム|t|トン)",
-            r"(\d+)\s*(倍|倍希釈)"
-        ]
-        
-        for pattern in quantity_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                quantities.append({
-                    "value": match.group(1),
-                    "unit": match.group(2),
-                    "normalized": self.normalize_units(match.group(0))
-                })
-        
-        return quantities
+        found = []
+        
+        # 数量パターンを1回の走査で検索し、単位は表引きで正規化
+        for match in _QUANTITY_RE.finditer(text):
+            order, value_group, unit_group = _QUANTITY_GROUPS[match.lastgroup]
+            value = match.group(value_group)
+            unit = match.group(unit_group)
+            canonical = _CANONICAL_UNITS.get(unit.lower())
+            found.append((order, {
+                "value": value,
+                "unit": unit,
+                "normalized": f"{value} {canonical}" if canonical else match.group(0)
+            }))
+        
+        # 従来どおりカテゴリ順（面積→容量→重量→希釈）に並べる
+        found.sort(key=lambda item: item[0])
+        return [quantity for _, quantity in found]
     
     def comprehensive_normalize(self, text: str) -> str:
         """包括的な正規化を実行する"""
         # 基本的な正規化
         normalized = text.strip()
         
-        # 各種正規化を適用
-        normalized = self.normalize_units(normalized)
-        normalized = self.normalize_time(normalized)
-        normalized = self.normalize_dilution(normalized)
-        
-        # 用語の正規化
-        for word in normalized.split():
-            crop = self.normalize_crop_name(word)
-            if crop != word:
-                normalized = normalized.replace(word, crop)
-            
-            task = self.normalize_task_name(word)
-            if task != word:
-                normalized = normalized.replace(word, task)
-            
-            material = self.normalize_material_name(word)
-            if material != word:
-                normalized = normalized.replace(word, material)
+        # 単位・時間・希釈倍率の正規化（単一ループで適用）
+        for pattern, replacement in self._compiled_all:
+            normalized = pattern.sub(replacement, normalized)
         
-        return normalized
+        # 用語の正規化（語ごとに作物→作業→資材の順で最初の一致を採用し、1回の走査で置換）
+        return _TOKEN_RE.sub(self._normalize_term, normalized)
+    
+    def _normalize_term(self, match: re.Match) -> str:
+        """1語を作物名・作業名・資材名のいずれかに正規化する"""
+        word = match.group(0)
+        lowered = word.lower()
+        for matcher, standards in (self._crop_lookup, self._task_lookup, self._material_lookup):
+            index = matcher.search(lowered)
+            if index is not None and standards[index] != word:
+                return standards[index]
+        return word
     
     def get_suggestions(self, partial_text: str) -> List[str]:
         """部分的なテキストに対する候補を提供する"""
-        suggestions = []
-        partial_lower = partial_text.lower()
-        
-        # 作物名の候補
-        for crop, synonyms in self.crop_synonyms.items():
-            if any(partial_lower in syn.lower() for syn in synonyms) or partial_lower in crop.lower():
-                suggestions.append(crop)
-        
-        # 作業名の候補
-        for task, synonyms in self.task_synonyms.items():
-            if any(partial_lower in syn.lower() for syn in synonyms) or partial_lower in task.lower():
-                suggestions.append(task)
-        
-        # 資材名の候補
-        for material, synonyms in self.material_synonyms.items():
-            if any(partial_lower in syn.lower() for syn in synonyms) or partial_lower in material.lower():
-                suggestions.append(material)
-        
-        return list(set(suggestions))
\ No newline at end of file
+        # 作物名・作業名・資材名の候補（部分一致）を索引から1回の参照で取得
+        return list(self._suggestion_index.get(partial_text.lower(), ()))
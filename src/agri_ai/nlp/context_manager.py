@@ -3,15 +3,39 @@
 """
 
 import json
-from typing import Dict, List, Optional, Any, Tuple
+import re
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 履歴の既定保持件数
+DEFAULT_MAX_HISTORY = 50
 
-@dataclass
+# 圃場名推測用パターン
+_FIELD_PATTERNS = tuple(re.compile(p) for p in (
+    r"([A-Z]\d+)",  # F14, A1 などの形式
+    r"([^\s]+(?:圃場|畑|ハウス))",
+    r"([^\s]+(?:家裏|家前|横|北|南|東|西))"
+))
+
+def _format_date(d: datetime) -> str:
+    """日付を YYYY-MM-DD 形式に変換（strftime の書式解析を省略）"""
+    return f"{d.year:04d}-{d.month:02d}-{d.day:02d}"
+
+
+# 直近の作業内容で置き換える代名詞
+_TOPIC_PRONOUNS = ("それ", "あれ")
+
+# 時間表現→基準日からの日数
+_TEMPORAL_OFFSETS = {"今日": 0, "昨日": -1, "明日": 1}
+
+
+@dataclass(slots=True)
 class ConversationContext:
     """対話の文脈情報"""
     user_id: str
@@ -19,29 +43,47 @@ class ConversationContext:
     current_field: Optional[str] = None
     current_crop: Optional[str] = None
     working_date: Optional[str] = None
-    recent_questions: List[str] = None
+    recent_questions: Deque[Dict[str, Any]] = None
     preferences: Dict[str, Any] = None
-    work_history: List[Dict[str, Any]] = None
+    work_history: Deque[Dict[str, Any]] = None
     created_at: datetime = None
     updated_at: datetime = None
     
     def __post_init__(self):
-        if self.recent_questions is None:
-            self.recent_questions = []
+        # 履歴は上限付きdequeで保持（超過分は自動的に破棄）
+        if not isinstance(self.recent_questions, deque):
+            self.recent_questions = deque(self.recent_questions or (), maxlen=DEFAULT_MAX_HISTORY)
         if self.preferences is None:
             self.preferences = {}
-        if self.work_history is None:
-            self.work_history = []
-        if self.created_at is None:
-            self.created_at = datetime.now()
-        if self.updated_at is None:
-            self.updated_at = datetime.now()
+        if not isinstance(self.work_history, deque):
+            self.work_history = deque(self.work_history or (), maxlen=DEFAULT_MAX_HISTORY)
+        if self.created_at is None or self.updated_at is None:
+            now = datetime.now()
+            if self.created_at is None:
+                self.created_at = now
+            if self.updated_at is None:
+                self.updated_at = now
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON化可能な辞書に変換（履歴の各要素は複製しない）"""
+        return {
+            "user_id": self.user_id,
+            "current_task": self.current_task,
+            "current_field": self.current_field,
+            "current_crop": self.current_crop,
+            "working_date": self.working_date,
+            "recent_questions": list(self.recent_questions),
+            "preferences": dict(self.preferences),
+            "work_history": list(self.work_history),
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat()
+        }
 
 
 class ContextManager:
     """対話の文脈を管理するクラス"""
     
-    def __init__(self, max_history_size: int = 50):
+    def __init__(self, max_history_size: int = DEFAULT_MAX_HISTORY):
         self.max_history_size = max_history_size
         self.contexts: Dict[str, ConversationContext] = {}
         
@@ -81,86 +123,100 @@ class ContextManager:
             "いつ": ["working_date", "schedule_time"],
             "誰": ["worker_name", "person_mentioned"]
         }
+        
+        # 推測用のフラットな検索表: (小文字化したキーワード, 値)
+        self._task_keywords = self._flatten_keywords(self.context_keywords["task_related"])
+        self._temporal_keywords = self._flatten_keywords(self.context_keywords["temporal"])
+        
+        # 省略表現→文脈の属性名（ConversationContextに存在する属性のみ）
+        context_fields = {f.name for f in fields(ConversationContext)}
+        self._ellipsis_keys: Dict[str, Tuple[str, ...]] = {}
+        for pronoun, context_keys in self.ellipsis_patterns.items():
+            keys = tuple(key for key in context_keys if key in context_fields)
+            if keys:
+                self._ellipsis_keys[pronoun] = keys
+        
+        # 解決対象の代名詞をまとめた正規表現（「それ」「あれ」は直近の話題からも推測）
+        pronouns = list(self._ellipsis_keys) + [p for p in _TOPIC_PRONOUNS if p not in self._ellipsis_keys]
+        self._pronoun_re = re.compile("|".join(map(re.escape, pronouns)))
+    
+    @staticmethod
+    def _flatten_keywords(table: Dict[str, List[str]]) -> Tuple[Tuple[str, str], ...]:
+        """{値: [キーワード]} を定義順の (キーワード, 値) の組に展開"""
+        return tuple((keyword.lower(), value) for value, keywords in table.items() for keyword in keywords)
     
-    def get_context(self, user_id: str) -> ConversationContext:
+    def get_context(self, user_id: str, now: Optional[datetime] = None) -> ConversationContext:
         """ユーザーの文脈を取得（存在しない場合は作成）"""
         if user_id not in self.contexts:
-            self.contexts[user_id] = ConversationContext(user_id=user_id)
+            self.contexts[user_id] = self._new_context(user_id=user_id, created_at=now, updated_at=now)
         
         return self.contexts[user_id]
     
-    def update_context(self, user_id: str, **kwargs) -> None:
-        """文脈情報を更新"""
-        context = self.get_context(user_id)
+    def _new_context(self, **data: Any) -> ConversationContext:
+        """履歴上限を反映した文脈を生成"""
+        data["recent_questions"] = deque(data.get("recent_questions") or (), maxlen=self.max_history_size)
+        data["work_history"] = deque(data.get("work_history") or (), maxlen=self.max_history_size)
+        return ConversationContext(**data)
+    
+    def update_context(self, user_id: str, now: Optional[datetime] = None, **kwargs) -> None:
+        """文脈情報を更新（now を渡すと同一リクエスト内で時刻を共有）"""
+        now = now or datetime.now()
+        context = self.get_context(user_id, now)
         
         for key, value in kwargs.items():
             if hasattr(context, key):
                 setattr(context, key, value)
         
-        context.updated_at = datetime.now()
+        context.updated_at = now
         logger.info(f"Updated context for user {user_id}: {kwargs}")
     
-    def add_question_to_history(self, user_id: str, question: str) -> None:
+    def add_question_to_history(self, user_id: str, question: str, now: Optional[datetime] = None) -> None:
         """質問を履歴に追加"""
-        context = self.get_context(user_id)
+        now = now or datetime.now()
+        context = self.get_context(user_id, now)
         context.recent_questions.append({
             "question": question,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now.isoformat()
         })
         
-        # 履歴サイズの制限
-        if len(context.recent_questions) > self.max_history_size:
-            context.recent_questions = context.recent_questions[-self.max_history_size:]
-        
-        context.updated_at = datetime.now()
+        context.updated_at = now
     
-    def add_work_to_history(self, user_id: str, work_info: Dict[str, Any]) -> None:
+    def add_work_to_history(self, user_id: str, work_info: Dict[str, Any], now: Optional[datetime] = None) -> None:
         """作業情報を履歴に追加"""
-        context = self.get_context(user_id)
+        now = now or datetime.now()
+        context = self.get_context(user_id, now)
         work_entry = {
             **work_info,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now.isoformat()
         }
         context.work_history.append(work_entry)
         
-        # 履歴サイズの制限
-        if len(context.work_history) > self.max_history_size:
-            context.work_history = context.work_history[-self.max_history_size:]
-        
-        context.updated_at = datetime.now()
+        context.updated_at = now
     
-    def infer_context_from_message(self, user_id: str, message: str) -> Dict[str, Any]:
+    def infer_context_from_message(self, user_id: str, message: str, now: Optional[datetime] = None) -> Dict[str, Any]:
         """メッセージから文脈を推測"""
-        context = self.get_context(user_id)
+        now = now or datetime.now()
+        context = self.get_context(user_id, now)
         inferred = {}
+        message_lower = message.lower()
         
         # タスク関連の推測
-        for task, keywords in self.context_keywords["task_related"].items():
-            if any(keyword in message.lower() for keyword in keywords):
+        for keyword, task in self._task_keywords:
+            if keyword in message_lower:
                 inferred["current_task"] = task
                 break
         
         # 時間関連の推測
-        for time_ref, keywords in self.context_keywords["temporal"].items():
-            if any(keyword in message.lower() for keyword in keywords):
-                if time_ref == "今日":
-                    inferred["working_date"] = datetime.now().strftime("%Y-%m-%d")
-                elif time_ref == "昨日":
-                    inferred["working_date"] = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-                elif time_ref == "明日":
-                    inferred["working_date"] = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        for keyword, time_ref in self._temporal_keywords:
+            if keyword in message_lower:
+                offset = _TEMPORAL_OFFSETS.get(time_ref)
+                if offset is not None:
+                    inferred["working_date"] = _format_date(now + timedelta(days=offset))
                 break
         
         # 圃場名の推測
-        field_patterns = [
-            r"([A-Z]\d+)",  # F14, A1 などの形式
-            r"([^\s]+(?:圃場|畑|ハウス))",
-            r"([^\s]+(?:家裏|家前|横|北|南|東|西))"
-        ]
-        
-        import re
-        for pattern in field_patterns:
-            match = re.search(pattern, message)
+        for pattern in _FIELD_PATTERNS:
+            match = pattern.search(message)
             if match:
                 inferred["current_field"] = match.group(1)
                 break
@@ -170,34 +226,28 @@ class ContextManager:
     def resolve_ellipsis(self, user_id: str, message: str) -> str:
         """省略表現を解決"""
         context = self.get_context(user_id)
-        resolved_message = message
         
-        # 代名詞の解決
-        for pronoun, context_keys in self.ellipsis_patterns.items():
-            if pronoun in message:
-                for key in context_keys:
-                    if hasattr(context, key):
-                        value = getattr(context, key)
-                        if value:
-                            resolved_message = resolved_message.replace(pronoun, str(value))
-                            break
-        
-        # 「それ」「あれ」の解決
-        if "それ" in message or "あれ" in message:
-            # 直近の質問から推測
-            if context.recent_questions:
-                last_question = context.recent_questions[-1]["question"]
-                # 最後の質問の主語を推測
-                if context.current_task:
-                    resolved_message = resolved_message.replace("それ", context.current_task)
-                    resolved_message = resolved_message.replace("あれ", context.current_task)
-        
-        return resolved_message
+        # 代名詞を1回の走査で解決（置き換えた値は再走査しないため、値に含まれる代名詞はそのまま残る）
+        return self._pronoun_re.sub(lambda m: self._resolve_pronoun(m.group(0), context), message)
+    
+    def _resolve_pronoun(self, pronoun: str, context: ConversationContext) -> str:
+        """代名詞を文脈の値に置き換える（解決できなければそのまま）"""
+        for key in self._ellipsis_keys.get(pronoun, ()):
+            value = getattr(context, key)
+            if value:
+                return str(value)
+        
+        # 「それ」「あれ」は直近の質問があれば現在のタスクとみなす
+        if pronoun in _TOPIC_PRONOUNS and context.recent_questions and context.current_task:
+            return context.current_task
+        
+        return pronoun
     
-    def get_relevant_context(self, user_id: str, message: str) -> Dict[str, Any]:
+    def get_relevant_context(self, user_id: str, message: str, now: Optional[datetime] = None) -> Dict[str, Any]:
         """メッセージに関連する文脈情報を取得"""
-        context = self.get_context(user_id)
+        context = self.get_context(user_id, now)
         relevant_context = {}
+        message_lower = message.lower()
         
         # 基本的な文脈情報
         if context.current_task:
@@ -210,13 +260,14 @@ class ContextManager:
             relevant_context["working_date"] = context.working_date
         
         # メッセージの内容に応じた関連情報
-        if any(word in message.lower() for word in ["前回", "この前", "昨日", "履歴"]):
+        if any(word in message_lower for word in ["前回", "この前", "昨日", "履歴"]):
             # 作業履歴から関連情報を取得
             if context.work_history:
-                recent_work = context.work_history[-3:]  # 最新3件
+                history = context.work_history
+                recent_work = list(islice(history, max(len(history) - 3, 0), None))  # 最新3件
                 relevant_context["recent_work"] = recent_work
         
-        if any(word in message.lower() for word in ["どこ", "場所", "圃場"]):
+        if any(word in message_lower for word in ["どこ", "場所", "圃場"]):
             # 圃場関連の情報
             if context.current_field:
                 relevant_context["field_info"] = {
@@ -224,11 +275,11 @@ class ContextManager:
                     "crop": context.current_crop
                 }
         
-        if any(word in message.lower() for word in ["いつ", "時間", "日付"]):
+        if any(word in message_lower for word in ["いつ", "時間", "日付"]):
             # 時間関連の情報
             relevant_context["temporal_info"] = {
                 "working_date": context.working_date,
-                "current_time": datetime.now().strftime("%H:%M")
+                "current_time": f"{(now or datetime.now()):%H:%M}"
             }
         
         return relevant_context
@@ -298,24 +349,19 @@ class ContextManager:
         """古い文脈を削除"""
         cutoff_date = datetime.now() - timedelta(days=days_threshold)
         
-        users_to_remove = []
-        for user_id, context in self.contexts.items():
-            if context.updated_at < cutoff_date:
-                users_to_remove.append(user_id)
-        
-        for user_id in users_to_remove:
-            del self.contexts[user_id]
+        # 残す文脈だけで辞書を再構築
+        total = len(self.contexts)
+        self.contexts = {
+            user_id: context
+            for user_id, context in self.contexts.items()
+            if context.updated_at >= cutoff_date
+        }
         
-        logger.info(f"Cleaned up {len(users_to_remove)} old contexts")
+        logger.info(f"Cleaned up {total - len(self.contexts)} old contexts")
     
     def export_context(self, user_id: str) -> Dict[str, Any]:
         """文脈をエクスポート"""
-        context = self.get_context(user_id)
-        return {
-            **asdict(context),
-            "created_at": context.created_at.isoformat(),
-            "updated_at": context.updated_at.isoformat()
-        }
+        return self.get_context(user_id).to_dict()
     
     def import_context(self, user_id: str, context_data: Dict[str, Any]) -> None:
         """文脈をインポート"""
@@ -325,21 +371,30 @@ class ContextManager:
         if "updated_at" in context_data:
             context_data["updated_at"] = datetime.fromisoformat(context_data["updated_at"])
         
-        self.contexts[user_id] = ConversationContext(**context_data)
+        self.contexts[user_id] = self._new_context(**context_data)
         logger.info(f"Imported context for user {user_id}")
     
     def get_statistics(self) -> Dict[str, Any]:
         """統計情報を取得"""
         total_contexts = len(self.contexts)
-        active_contexts = sum(1 for ctx in self.contexts.values() 
-                            if ctx.updated_at > datetime.now() - timedelta(hours=24))
+        cutoff = datetime.now() - timedelta(hours=24)
+        
+        # 1回の走査で集計
+        active_contexts = 0
+        total_questions = 0
+        total_work_history = 0
+        for ctx in self.contexts.values():
+            if ctx.updated_at > cutoff:
+                active_contexts += 1
+            total_questions += len(ctx.recent_questions)
+            total_work_history += len(ctx.work_history)
         
         avg_questions = 0
         avg_work_history = 0
         
         if total_contexts > 0:
-            avg_questions = sum(len(ctx.recent_questions) for ctx in self.contexts.values()) / total_contexts
-            avg_work_history = sum(len(ctx.work_history) for ctx in self.contexts.values()) / total_contexts
+            avg_questions = total_questions / total_contexts
+            avg_work_history = total_work_history / total_contexts
         
         return {
             "total_contexts": total_contexts,
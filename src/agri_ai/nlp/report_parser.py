@@ -9,11 +9,78 @@ from datetime import datetime, timedelta
 from dataclasses import dataclass
 import logging
 
-from .agricultural_glossary import AgriculturalGlossary
+from .agricultural_glossary import AgriculturalGlossary, KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
 
+_COMPLETION_INDICATORS = KeywordMatcher(["完了", "終了", "終わり", "できた", "やった", "実施した", "行った"])
+_PENDING_INDICATORS = KeywordMatcher(["未完了", "未実施", "未着手", "途中", "継続中"])
+# 相対日付: キーワード（今日→昨日→明日の優先順）と基準日からの日数
+_RELATIVE_DATE_WORDS = (
+    ("今日", 0), ("きょう", 0), ("本日", 0),
+    ("昨日", -1), ("きのう", -1),
+    ("明日", 1), ("あした", 1), ("あす", 1),
+)
+_RELATIVE_DATES = KeywordMatcher([word for word, _ in _RELATIVE_DATE_WORDS])
+_WEATHER_KEYWORDS = KeywordMatcher(["晴れ", "曇り", "雨", "雪", "風", "暑い", "寒い", "湿度", "乾燥"])
+
+# 各パターン群が一致するために必須の語（いずれも含まなければ検索を省略する）
+# 非アンカーの (.+?) は一致しない長文で総当たりになるため、必須語の有無を先に1回の走査で判定する
+_PATTERN_PREFILTERS = {
+    "completion": KeywordMatcher(["完了", "終了", "終わり", "できた", "やった", "行った", "した"]),
+    "material_usage": KeywordMatcher(["散布", "使用", "撒いた", "かけた"]),
+    "weather": KeywordMatcher(["でした", "です", "だ"]),
+    "suggestion": KeywordMatcher(["次", "今度"]),
+}
+
+
+
+class _PatternSet:
+    """複数の正規表現を1つの選択パターンにまとめ、リスト順で最初に一致するものを1回の走査で探す"""
+    
+    __slots__ = ("patterns", "_regex", "_priority")
+    
+    def __init__(self, patterns: List[re.Pattern]):
+        self.patterns = tuple(patterns)
+        # グループ名 p<i> がパターンの優先順位
+        self._regex = re.compile("|".join(f"(?P<p{i}>{p.pattern})" for i, p in enumerate(self.patterns)))
+        self._priority = {f"p{i}": i for i in range(len(self.patterns))}
+    
+    def search(self, text: str) -> Optional[re.Match]:
+        """パターンを順に search した場合と同じ一致を返す"""
+        match = self._regex.search(text)
+        if match is None:
+            return None
+        
+        # 優先順位の高いパターンは最左一致より右でしか一致しない
+        priority = self._priority[match.lastgroup]
+        start = match.start()
+        for pattern in self.patterns[:priority]:
+            higher = pattern.search(text, start + 1)
+            if higher:
+                return higher
+        # 元のパターンで取り直し、グループ番号を揃える
+        return self.patterns[priority].match(text, start)
+
+
+# 希釈倍率
+_DILUTION_RE = re.compile(r"(\d+)\s*倍")
+
+# 備考キーワードの後続テキスト
+_NOTE_PATTERNS = _PatternSet([
+    re.compile(f"{keyword}[：:]\\s*(.+)")
+    for keyword in ("備考", "メモ", "注意", "問題", "課題", "その他")
+])
+
+# 次回作業提案
+_SUGGESTION_PATTERNS = _PatternSet([re.compile(p) for p in (
+    r"次(?:回|に)(?:は|の)?(.+?)(?:が|を|は)(?:必要|やる|する|実施)",
+    r"今度(.+?)(?:が|を|は)(?:必要|やる|する|実施)",
+    r"(?:次|今度)(.+?)(?:してください|した方がよい|すべき)"
+)])
+
+
 @dataclass
 class ParsedWorkReport:
     """解析された作業報告データ"""
@@ -85,9 +152,48 @@ class WorkReportParser:
             r"昨日|きのう",
             r"明日|あした|あす"
         ]
+        
+        # 正規表現は初期化時に一度だけコンパイル
+        self.report_patterns = {
+            category: [re.compile(pattern) for pattern in patterns]
+            for category, patterns in self.report_patterns.items()
+        }
+        self.date_patterns = [re.compile(pattern) for pattern in self.date_patterns]
+        
+        # 先頭一致で使うパターン群は1つの正規表現にまとめて1回で走査
+        self._pattern_sets = {
+            category: _PatternSet(self.report_patterns[category])
+            for category in ("completion", "time_info", "weather")
+        }
+        # 具体的な日付（年月日・月日）のみ。相対日付は KeywordMatcher で判定済み
+        self._date_patterns = _PatternSet(
+            [pattern for pattern in self.date_patterns if pattern.groups]
+        )
+        
+        # 作業名・作物名の検索（正規名、同義語→正規名）
+        self._task_names = KeywordMatcher(list(self.glossary.task_synonyms))
+        self._crop_names = KeywordMatcher(list(self.glossary.crop_synonyms))
+        crop_synonyms = [
+            (synonym, crop_name)
+            for crop_name, synonyms in self.glossary.crop_synonyms.items()
+            for synonym in synonyms
+        ]
+        self._crop_synonyms = KeywordMatcher([synonym for synonym, _ in crop_synonyms])
+        self._crop_synonym_names = tuple(crop_name for _, crop_name in crop_synonyms)
+        
+        # 作物・作業・資材の全同義語（語の正規化対象かどうかの事前判定用）
+        self._glossary_synonyms = KeywordMatcher([
+            synonym
+            for table in (self.glossary.crop_synonyms, self.glossary.task_synonyms, self.glossary.material_synonyms)
+            for synonyms in table.values()
+            for synonym in synonyms
+        ])
     
-    def parse_report(self, text: str, context: Optional[Dict[str, Any]] = None) -> ParsedWorkReport:
-        """作業報告テキストを解析して構造化データに変換"""
+    def parse_report(self, text: str, context: Optional[Dict[str, Any]] = None,
+                     now: Optional[datetime] = None) -> ParsedWorkReport:
+        """作業報告テキストを解析して構造化データに変換（now を渡すと日付の基準時刻に使用）"""
+        now = now or datetime.now()
+        
         # 前処理
         normalized_text = self.glossary.comprehensive_normalize(text)
         
@@ -107,7 +213,7 @@ class WorkReportParser:
         report.completion_status = self._extract_completion_status(normalized_text)
         
         # 日付・時間の抽出
-        report.work_date = self._extract_date(normalized_text, context)
+        report.work_date = self._extract_date(normalized_text, context, now)
         report.start_time, report.end_time = self._extract_time_range(normalized_text)
         
         # 使用資材の抽出
@@ -131,22 +237,35 @@ class WorkReportParser:
         logger.info(f"Parsed report with confidence {report.confidence_score:.2f}")
         return report
     
+    def _candidate_patterns(self, category: str, text: str) -> List[re.Pattern]:
+        """必須語を含む場合のみ、カテゴリのパターンを返す"""
+        prefilter = _PATTERN_PREFILTERS.get(category)
+        if prefilter is not None and not prefilter.contains(text):
+            return []
+        return self.report_patterns[category]
+    
+    def _search_patterns(self, category: str, text: str) -> Optional[re.Match]:
+        """必須語を含む場合のみ、カテゴリのパターンで最初の一致を探す"""
+        prefilter = _PATTERN_PREFILTERS.get(category)
+        if prefilter is not None and not prefilter.contains(text):
+            return None
+        return self._pattern_sets[category].search(text)
+    
     def _extract_task_name(self, text: str) -> Optional[str]:
         """作業名を抽出"""
         # 完了パターンから作業名を抽出
-        for pattern in self.report_patterns["completion"]:
-            match = re.search(pattern, text)
-            if match:
-                task_candidate = match.group(1).strip()
-                normalized_task = self.glossary.normalize_task_name(task_candidate)
-                if normalized_task != task_candidate:
-                    return normalized_task
-                return task_candidate
+        match = self._search_patterns("completion", text)
+        if match:
+            task_candidate = match.group(1).strip()
+            normalized_task = self.glossary.normalize_task_name(task_candidate)
+            if normalized_task != task_candidate:
+                return normalized_task
+            return task_candidate
         
         # 直接的な作業名を検索
-        for task_name in self.glossary.task_synonyms.keys():
-            if task_name in text:
-                return task_name
+        index = self._task_names.search(text)
+        if index is not None:
+            return self._task_names.keywords[index]
         
         return None
     
@@ -156,59 +275,48 @@ class WorkReportParser:
     
     def _extract_crop_name(self, text: str) -> Optional[str]:
         """作物名を抽出"""
-        for crop_name in self.glossary.crop_synonyms.keys():
-            if crop_name in text:
-                return crop_name
+        index = self._crop_names.search(text)
+        if index is not None:
+            return self._crop_names.keywords[index]
         
         # 作物名の候補を検索
-        for crop_name, synonyms in self.glossary.crop_synonyms.items():
-            for synonym in synonyms:
-                if synonym in text.lower():
-                    return crop_name
+        index = self._crop_synonyms.search(text.lower())
+        if index is not None:
+            return self._crop_synonym_names[index]
         
         return None
     
     def _extract_completion_status(self, text: str) -> Optional[str]:
         """完了ステータスを抽出"""
-        completion_indicators = ["完了", "終了", "終わり", "できた", "やった", "実施した", "行った"]
-        pending_indicators = ["未完了", "未実施", "未着手", "途中", "継続中"]
-        
-        for indicator in completion_indicators:
-            if indicator in text:
-                return "完了"
+        if _COMPLETION_INDICATORS.contains(text):
+            return "完了"
         
-        for indicator in pending_indicators:
-            if indicator in text:
-                return "未完了"
+        if _PENDING_INDICATORS.contains(text):
+            return "未完了"
         
         return None
     
-    def _extract_date(self, text: str, context: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    def _extract_date(self, text: str, context: Optional[Dict[str, Any]] = None,
+                      now: Optional[datetime] = None) -> Optional[str]:
         """日付を抽出"""
-        today = datetime.now()
+        today = now or datetime.now()
         
         # 相対日付の処理
-        if any(word in text for word in ["今日", "きょう", "本日"]):
-            return today.strftime("%Y-%m-%d")
-        elif any(word in text for word in ["昨日", "きのう"]):
-            return (today - timedelta(days=1)).strftime("%Y-%m-%d")
-        elif any(word in text for word in ["明日", "あした", "あす"]):
-            return (today + timedelta(days=1)).strftime("%Y-%m-%d")
+        index = _RELATIVE_DATES.search(text)
+        if index is not None:
+            offset = _RELATIVE_DATE_WORDS[index][1]
+            return (today + timedelta(days=offset)).date().isoformat()
         
         # 具体的な日付パターン
-        for pattern in self.date_patterns:
-            match = re.search(pattern, text)
-            if match:
-                try:
-                    groups = match.groups()
-                    if len(groups) == 3:  # 年月日
-                        year, month, day = groups
-                        return f"{year}-{int(month):02d}-{int(day):02d}"
-                    elif len(groups) == 2:  # 月日（今年として扱う）
-                        month, day = groups
-                        return f"{today.year}-{int(month):02d}-{int(day):02d}"
-                except:
-                    continue
+        match = self._date_patterns.search(text)
+        if match:
+            groups = match.groups()
+            if len(groups) == 3:  # 年月日
+                year, month, day = groups
+                return f"{year}-{int(month):02d}-{int(day):02d}"
+            elif len(groups) == 2:  # 月日（今年として扱う）
+                month, day = groups
+                return f"{today.year}-{int(month):02d}-{int(day):02d}"
         
         # コンテキストから日付を推測
         if context and "default_date" in context:
@@ -218,12 +326,11 @@ class WorkReportParser:
     
     def _extract_time_range(self, text: str) -> Tuple[Optional[str], Optional[str]]:
         """時間範囲を抽出"""
-        for pattern in self.report_patterns["time_info"]:
-            match = re.search(pattern, text)
-            if match:
-                start_time = self.glossary.normalize_time(match.group(1))
-                end_time = self.glossary.normalize_time(match.group(2))
-                return start_time, end_time
+        match = self._search_patterns("time_info", text)
+        if match:
+            start_time = self.glossary.normalize_time(match.group(1))
+            end_time = self.glossary.normalize_time(match.group(2))
+            return start_time, end_time
         
         return None, None
     
@@ -232,14 +339,14 @@ class WorkReportParser:
         materials = []
         
         # 資材使用パターンを検索
-        for pattern in self.report_patterns["material_usage"]:
-            match = re.search(pattern, text)
+        for pattern in self._candidate_patterns("material_usage", text):
+            match = pattern.search(text)
             if match:
                 material_name = match.group(1).strip()
                 normalized_material = self.glossary.normalize_material_name(material_name)
                 
                 # 希釈倍率の検出
-                dilution_match = re.search(r"(\d+)\s*倍", text)
+                dilution_match = _DILUTION_RE.search(text)
                 dilution = dilution_match.group(1) + "倍" if dilution_match else None
                 
                 materials.append({
@@ -259,30 +366,23 @@ class WorkReportParser:
     
     def _extract_weather(self, text: str) -> Optional[str]:
         """天候情報を抽出"""
-        weather_keywords = ["晴れ", "曇り", "雨", "雪", "風", "暑い", "寒い", "湿度", "乾燥"]
-        
-        for keyword in weather_keywords:
-            if keyword in text:
-                return keyword
+        index = _WEATHER_KEYWORDS.search(text)
+        if index is not None:
+            return _WEATHER_KEYWORDS.keywords[index]
         
         # 天候パターンを検索
-        for pattern in self.report_patterns["weather"]:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(1).strip()
+        match = self._search_patterns("weather", text)
+        if match:
+            return match.group(1).strip()
         
         return None
     
     def _extract_notes(self, text: str) -> Optional[str]:
         """備考・メモを抽出"""
         # 特定のキーワード後のテキストを備考として抽出
-        note_keywords = ["備考", "メモ", "注意", "問題", "課題", "その他"]
-        
-        for keyword in note_keywords:
-            pattern = f"{keyword}[：:]\\s*(.+)"
-            match = re.search(pattern, text)
-            if match:
-                return match.group(1).strip()
+        match = _NOTE_PATTERNS.search(text)
+        if match:
+            return match.group(1).strip()
         
         # 文脈から重要な情報を抽出
         context_info = []
@@ -298,17 +398,13 @@ class WorkReportParser:
     
     def _extract_next_task_suggestion(self, text: str) -> Optional[str]:
         """次回作業提案を抽出"""
-        suggestion_patterns = [
-            r"次(?:回|に)(?:は|の)?(.+?)(?:が|を|は)(?:必要|やる|する|実施)",
-            r"今度(.+?)(?:が|を|は)(?:必要|やる|する|実施)",
-            r"(?:次|今度)(.+?)(?:してください|した方がよい|すべき)"
-        ]
+        if not _PATTERN_PREFILTERS["suggestion"].contains(text):
+            return None
         
-        for pattern in suggestion_patterns:
-            match = re.search(pattern, text)
-            if match:
-                suggestion = match.group(1).strip()
-                return self.glossary.normalize_task_name(suggestion)
+        match = _SUGGESTION_PATTERNS.search(text)
+        if match:
+            suggestion = match.group(1).strip()
+            return self.glossary.normalize_task_name(suggestion)
         
         return None
     
@@ -342,6 +438,9 @@ class WorkReportParser:
         # 正規化された用語の使用
         normalized_terms = 0
         for term in text.split():
+            # 同義語を含まない語は正規化されないため、1回の検索で除外
+            if not self._glossary_synonyms.contains(term.lower()):
+                continue
             if (self.glossary.normalize_crop_name(term) != term or
                 self.glossary.normalize_task_name(term) != term or
                 self.glossary.normalize_material_name(term) != term):
@@ -478,7 +478,7 @@ class AirtableToMongoMigrator:
                 return migration_result
             
             # Get MongoDB collection
-            collection = await self.mongo_client.get_collection(mongo_collection_name)
+            collection = self.mongo_client.get_collection(mongo_collection_name)
             
             # Transform and insert records
             mongo_documents = []
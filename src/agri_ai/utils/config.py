@@ -71,6 +71,12 @@ class Settings(BaseSettings):
     # Database
     mongodb_uri: str = Field(..., env="MONGODB_URI")
     mongodb_database: str = Field(default="agri_ai_db", env="MONGODB_DATABASE")
+    mongodb_max_pool_size: int = Field(default=256, env="MONGODB_MAX_POOL_SIZE")
+    mongodb_min_pool_size: int = Field(default=16, env="MONGODB_MIN_POOL_SIZE")
+    mongodb_max_idle_time_ms: int = Field(default=300_000, env="MONGODB_MAX_IDLE_TIME_MS")
+    mongodb_max_connecting: int = Field(default=4, env="MONGODB_MAX_CONNECTING")
+    mongodb_server_selection_timeout_ms: int = Field(default=5000, env="MONGODB_SERVER_SELECTION_TIMEOUT_MS")
+    mongodb_connect_timeout_ms: int = Field(default=5000, env="MONGODB_CONNECT_TIMEOUT_MS")
     
     # AI APIs
     openai_api_key: Optional[str] = Field(None, env="OPENAI_API_KEY")
@@ -96,6 +102,8 @@ class Settings(BaseSettings):
     max_agents: Optional[int] = Field(None, env="MAX_AGENTS")
     agent_ttl_minutes: Optional[int] = Field(None, env="AGENT_TTL_MINUTES")
     request_timeout_seconds: Optional[int] = Field(None, env="REQUEST_TIMEOUT_SECONDS")
+    query_cache_max_bytes: int = Field(default=64 * 1024 * 1024, env="QUERY_CACHE_MAX_BYTES")
+    redis_url: Optional[str] = Field(None, env="REDIS_URL")
     
     # LINE Bot specific
     max_message_length: int = Field(default=2000, env="MAX_MESSAGE_LENGTH")
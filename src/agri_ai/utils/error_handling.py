@@ -16,6 +16,7 @@ from ..exceptions import (
     LINEBotError,
     APIError,
     TimeoutError,
+    ErrCode,
     get_user_friendly_message
 )
 
@@ -51,7 +52,7 @@ class ErrorHandler:
                         "error_type": type(e).__name__
                     })
                     if return_error_message:
-                        return get_user_friendly_message("GENERAL_ERROR")
+                        return get_user_friendly_message(ErrCode.GENERAL_ERROR)
                     raise default_exception(f"{operation}中にエラーが発生しました: {str(e)}")
             return wrapper
         return decorator
@@ -84,7 +85,7 @@ class ErrorHandler:
                         "error_type": type(e).__name__
                     })
                     if return_error_message:
-                        return get_user_friendly_message("GENERAL_ERROR")
+                        return get_user_friendly_message(ErrCode.GENERAL_ERROR)
                     raise default_exception(f"{operation}中にエラーが発生しました: {str(e)}")
             return wrapper
         return decorator
@@ -128,8 +129,9 @@ class ErrorHandler:
         timestamp = datetime.now().isoformat()
         
         if isinstance(exception, AgriAIException):
-            error_code = exception.error_code
-            message = get_user_friendly_message(error_code)
+            message = get_user_friendly_message(exception.error_code)
+            # レスポンスには従来どおり文字列のコード名を返す
+            error_code = getattr(exception.error_code, "name", exception.error_code)
             context = exception.context if include_details else {}
             
             logger.error(f"Error in {operation}: {exception.message}", extra={
@@ -148,8 +150,8 @@ class ErrorHandler:
             }
         
         elif isinstance(exception, Exception):
-            error_code = "GENERAL_ERROR"
-            message = get_user_friendly_message(error_code)
+            error_code = ErrCode.GENERAL_ERROR.name
+            message = get_user_friendly_message(ErrCode.GENERAL_ERROR)
             
             logger.error(f"Unexpected error in {operation}: {str(exception)}", extra={
                 "operation": operation,
@@ -169,7 +171,7 @@ class ErrorHandler:
             # 文字列の場合
             return {
                 "success": False,
-                "error_code": "GENERAL_ERROR",
+                "error_code": ErrCode.GENERAL_ERROR.name,
                 "message": str(exception),
                 "timestamp": timestamp,
                 "operation": operation
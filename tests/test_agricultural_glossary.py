@@ -0,0 +1,64 @@
+"""
+Tests for the agricultural glossary.
+"""
+
+import pytest
+from src.agri_ai.nlp.agricultural_glossary import AgriculturalGlossary, KeywordMatcher
+
+
+class TestKeywordMatcher:
+    """Test the combined keyword matcher."""
+    
+    def test_earlier_keyword_wins_when_further_right(self):
+        """Test that list order, not position, decides the result."""
+        matcher = KeywordMatcher(["防除", "散布", "収穫"])
+        
+        assert matcher.search("収穫の後に散布、最後に防除") == 0
+        assert matcher.search("収穫の後に散布") == 1
+        assert matcher.search("収穫") == 2
+        assert matcher.search("播種") is None
+    
+    def test_overlapping_keywords(self):
+        """Test keywords that overlap or share a start position."""
+        matcher = KeywordMatcher(["bc", "abc", "ab"])
+        
+        assert matcher.search("abc") == 0
+        assert matcher.search("abd") == 2
+        assert KeywordMatcher(["ab", "abc"]).search("abc") == 0
+    
+    def test_duplicate_keywords_use_first_index(self):
+        """Test that a duplicated keyword reports its first position in the list."""
+        matcher = KeywordMatcher(["雨", "晴れ", "雨"])
+        
+        assert matcher.search("晴れのち雨") == 0
+        assert matcher.search("雨") == 0
+        assert matcher.keywords[matcher.search("晴れ")] == "晴れ"
+    
+    def test_contains_escapes_keywords(self):
+        """Test that keywords are matched literally."""
+        matcher = KeywordMatcher(["1.5L", "a+b"])
+        
+        assert matcher.contains("散布量1.5L")
+        assert not matcher.contains("散布量15L")
+        assert matcher.search("a+b") == 1
+        assert not matcher.contains("aab")
+
+
+class TestExtractFieldName:
+    """Test field name extraction."""
+    
+    @pytest.fixture
+    def glossary(self):
+        """Create a glossary."""
+        return AgriculturalGlossary()
+    
+    @pytest.mark.parametrize("text, expected", [
+        ("鵡川 F14で作業", "F14"),           # field codes win even when further right
+        ("石谷さん横 第1圃場", "第1圃場"),   # 圃場 names rank above 横
+        ("豊糠 鵡川", "鵡川"),
+        ("A1 豊糠", "A1"),
+        ("今日は晴れ", None),
+    ])
+    def test_pattern_priority(self, glossary, text, expected):
+        """Test that pattern priority, not position, decides the match."""
+        assert glossary.extract_field_name(text) == expected
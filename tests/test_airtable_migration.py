@@ -105,7 +105,7 @@ class TestAirtableToMongoMigrator:
     @pytest.fixture
     def mock_mongo_client(self):
         """Create a mock MongoDB client."""
-        return AsyncMock()
+        return MagicMock()
     
     @pytest.fixture
     def migrator(self, mock_airtable_client, mock_mongo_client):
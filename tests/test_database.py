@@ -35,6 +35,15 @@ class TestMongoDBClient:
         result = await mock_client.health_check()
         assert result is False
 
+    @pytest.mark.asyncio
+    async def test_health_check_debounced(self, mock_client):
+        """Test that a recent successful ping is reused."""
+        mock_client.client.admin.command.return_value = {"ok": 1}
+
+        assert await mock_client.health_check() is True
+        assert await mock_client.health_check() is True
+        mock_client.client.admin.command.assert_awaited_once_with('ping')
+
 
 class TestAgriDatabase:
     """Test agricultural database operations."""
@@ -42,7 +51,7 @@ class TestAgriDatabase:
     @pytest.fixture
     def mock_mongo_client(self):
         """Create a mock MongoDB client."""
-        return AsyncMock()
+        return MagicMock()
     
     @pytest.fixture
     def agri_db(self, mock_mongo_client):
@@ -0,0 +1,180 @@
+"""
+Tests for DatabasePool query caching.
+"""
+
+import pytest
+from unittest.mock import MagicMock
+from src.agri_ai.core.database_pool import DatabasePool, _MISS, _could_match, _lookup_collections, _update_images
+
+
+class TestDatabasePoolCacheKey:
+    """Test cache key generation."""
+    
+    @pytest.fixture
+    def db_pool(self):
+        """Create a DatabasePool with mock settings."""
+        settings = MagicMock()
+        settings.query_cache_max_bytes = 1024 * 1024
+        return DatabasePool(settings)
+    
+    def test_key_order_and_in_order_ignored(self, db_pool):
+        """Test that key order and $in element order do not change the key."""
+        key1 = db_pool._get_cache_key("find_one", "圃場データ", {"a": 1, "b": {"$in": [2, 3]}})
+        key2 = db_pool._get_cache_key("find_one", "圃場データ", {"b": {"$in": [3, 2]}, "a": 1})
+        
+        assert key1 == key2
+    
+    def test_eq_operator_canonicalized(self, db_pool):
+        """Test that {"$eq": x} shares the key with a plain equality."""
+        key1 = db_pool._get_cache_key("find_one", "圃場データ", {"圃場名": {"$eq": "鴨川家裏"}})
+        key2 = db_pool._get_cache_key("find_one", "圃場データ", {"圃場名": "鴨川家裏"})
+        
+        assert key1 == key2
+    
+    def test_pipeline_stage_order_kept(self, db_pool):
+        """Test that aggregation stage order still distinguishes keys."""
+        stages = [{"$match": {"a": 1}}, {"$limit": 1}]
+        key1 = db_pool._get_cache_key("aggregate", "圃場データ", {"pipeline": stages})
+        key2 = db_pool._get_cache_key("aggregate", "圃場データ", {"pipeline": stages[::-1]})
+        
+        assert key1 != key2
+    
+    def test_expression_in_order_kept(self, db_pool):
+        """Test that $in argument order inside $expr and $lookup pipelines is kept."""
+        def lookup(expr):
+            return {"pipeline": [
+                {"$match": {"圃場ID": {"$in": ["F2", "F1"]}}},
+                {"$lookup": {"from": "作業記録", "let": {"ids": "$作業ID"}, "pipeline": [
+                    {"$match": {"$expr": expr}}
+                ], "as": "作業"}}
+            ]}
+        key1 = db_pool._get_cache_key("aggregate", "圃場データ", lookup({"$in": ["$_id", "$$ids"]}))
+        key2 = db_pool._get_cache_key("aggregate", "圃場データ", lookup({"$in": ["$$ids", "$_id"]}))
+        key3 = db_pool._get_cache_key("find_one", "圃場データ", {"$expr": {"$in": ["$a", "$b"]}})
+        key4 = db_pool._get_cache_key("find_one", "圃場データ", {"$expr": {"$in": ["$b", "$a"]}})
+        
+        assert key1 != key2
+        assert key3 != key4
+    
+    def test_match_stage_in_order_ignored(self, db_pool):
+        """Test that $in element order in a $match stage does not change the key."""
+        key1 = db_pool._get_cache_key("aggregate", "圃場データ", {"pipeline": [{"$match": {"a": {"$in": [1, 2]}}}]})
+        key2 = db_pool._get_cache_key("aggregate", "圃場データ", {"pipeline": [{"$match": {"a": {"$in": [2, 1]}}}]})
+        
+        assert key1 == key2
+
+
+class TestDatabasePoolInvalidation:
+    """Test selective cache invalidation on writes."""
+    
+    @pytest.fixture
+    def db_pool(self):
+        """Create a DatabasePool with mock settings."""
+        settings = MagicMock()
+        settings.query_cache_max_bytes = 1024 * 1024
+        return DatabasePool(settings)
+    
+    def test_could_match_inserted_document(self):
+        """Test matching against a fully known inserted document."""
+        document = {"圃場ID": "F1", "関連する作付計画": ["rec1", "rec2"]}
+        
+        assert _could_match({"圃場ID": "F1"}, document, True)
+        assert not _could_match({"圃場ID": "F2"}, document, True)
+        assert _could_match({"関連する作付計画": "rec2"}, document, True)
+        assert not _could_match({"作物": "大豆"}, document, True)
+    
+    def test_update_images_ignore_array_filter_values(self):
+        """Test that a filter on a possibly-array field does not rule out other elements."""
+        images = _update_images({"関連する作付計画": "rec1"}, {"$set": {"状態": "完了"}})
+        
+        assert all(_could_match({"関連する作付計画": "rec2"}, known, complete) for known, complete in images)
+        assert not any(_could_match({"状態": "未着手"}, known, complete) for known, complete in images[1:])
+    
+    def test_update_images_keep_key_fields(self):
+        """Test that key fields from the filter narrow the before/after images."""
+        images = _update_images({"圃場ID": "F1"}, {"$set": {"作物": "大豆"}})
+        
+        assert not any(_could_match({"圃場ID": "F2"}, known, complete) for known, complete in images)
+        assert _update_images({"圃場ID": "F1"}, {"作物": "大豆"}) is None
+    
+    def test_invalidate_cache_only_matching_keys(self, db_pool):
+        """Test that only cached queries the written document could match are evicted."""
+        db_pool._cache_store("圃場データ", 1, {"圃場ID": "F1"}, {"圃場ID": "F1"})
+        db_pool._cache_store("圃場データ", 2, {"圃場ID": "F2"}, {"圃場ID": "F2"})
+        db_pool._cache_store("圃場データ", 3, [], {"関連する作付計画": "rec2"})
+        
+        db_pool._invalidate_cache("圃場データ", _update_images(
+            {"圃場ID": "F1", "関連する作付計画": "rec1"}, {"$set": {"作物": "大豆"}}
+        ))
+        
+        assert set(db_pool.query_cache) == {2}
+        assert db_pool._keys_by_collection["圃場データ"].keys() == {2}
+        assert set(db_pool._collection_by_key) == {2}
+    
+    def test_invalidate_cache_without_images_clears_collection(self, db_pool):
+        """Test that a write with unknown images drops the collection's cache."""
+        db_pool._cache_store("圃場データ", 1, {"圃場ID": "F1"}, {"圃場ID": "F1"})
+        db_pool._cache_store("作業計画", 2, [], None)
+        
+        db_pool._invalidate_cache("圃場データ")
+        
+        assert set(db_pool.query_cache) == {2}
+        assert "圃場データ" not in db_pool._keys_by_collection
+    
+    def test_invalidate_cache_on_lookup_collection_write(self, db_pool):
+        """Test that writes to a $lookup source evict the cached aggregate."""
+        pipeline = [
+            {"$match": {"圃場名": "鴨川家裏"}},
+            {"$lookup": {"from": "資材使用記録", "pipeline": [
+                {"$lookup": {"from": "資材マスター", "localField": "資材", "foreignField": "_id", "as": "m"}}
+            ], "as": "usage"}}
+        ]
+        assert _lookup_collections(pipeline) == {"資材使用記録", "資材マスター"}
+        
+        db_pool._cache_store("圃場データ", 1, [], pipeline[0]["$match"], related=_lookup_collections(pipeline))
+        db_pool._invalidate_cache("資材使用記録", [({"圃場": "F1", "資材": "M1"}, True)])
+        
+        assert 1 not in db_pool.query_cache
+        assert db_pool._keys_by_collection == {}
+        assert db_pool._collection_by_key == {}
+
+
+class TestDatabasePoolQueryCache:
+    """Test the byte-bounded query cache."""
+    
+    @pytest.fixture
+    def db_pool(self):
+        """Create a DatabasePool with a small cache."""
+        settings = MagicMock()
+        settings.query_cache_max_bytes = 1024
+        return DatabasePool(settings)
+    
+    def test_eviction_removes_index_entries(self, db_pool):
+        """Test that LRU eviction also removes the key from the collection index."""
+        db_pool._cache_store("圃場データ", 1, "x" * 600, None)
+        db_pool._cache_store("作業記録", 2, "y" * 600, None)
+        
+        assert 1 not in db_pool.query_cache
+        assert "圃場データ" not in db_pool._keys_by_collection
+        assert 1 not in db_pool._collection_by_key
+        assert db_pool._collection_by_key[2] == ("作業記録",)
+    
+    def test_oversize_result_not_cached(self, db_pool):
+        """Test that a result larger than the whole cache is not stored."""
+        db_pool._cache_store("圃場データ", 1, "x" * 2048, None)
+        
+        assert 1 not in db_pool.query_cache
+        assert db_pool._keys_by_collection == {}
+        assert db_pool._collection_by_key == {}
+    
+    def test_expired_entry_is_miss(self, db_pool):
+        """Test that an entry past its TTL is reported as a miss."""
+        db_pool._cache_store("圃場データ", 1, [], None)
+        assert db_pool._cache_get(1) == []
+        
+        db_pool.cache_ttl = -1.0
+        db_pool._cache_store("圃場データ", 2, [], None)
+        
+        assert db_pool._cache_get(2) is _MISS
+        assert db_pool.cache_hits == 1
+        assert db_pool.cache_misses == 1
@@ -0,0 +1,34 @@
+"""
+Tests for LINE Bot utility functions.
+"""
+
+import pytest
+from src.agri_ai.line_bot.utils import extract_field_name, extract_task_type
+
+
+class TestExtractFieldName:
+    """Test field name extraction."""
+    
+    @pytest.mark.parametrize("message, expected", [
+        ("鵡川家裏 F14", "F14"),                  # field codes win even when further right
+        ("f14の防除", "F14"),                     # lowercase codes are normalized
+        ("石谷さん横と大豆の圃場", "石谷さん横"),
+        ("トマトの圃場と鵡川の家裏", "鵡川の家裏"),  # earlier-listed pattern wins
+        ("こんにちは", None),
+    ])
+    def test_pattern_priority(self, message, expected):
+        """Test that pattern priority, not position, decides the match."""
+        assert extract_field_name(message) == expected
+
+
+class TestExtractTaskType:
+    """Test task type extraction."""
+    
+    @pytest.mark.parametrize("message, expected", [
+        ("水やりの後に防除", "防除"),  # higher-priority task further right
+        ("草刈りと点検", "除草"),
+        ("こんにちは", None),
+    ])
+    def test_task_priority(self, message, expected):
+        """Test that task type priority, not position, decides the match."""
+        assert extract_task_type(message) == expected